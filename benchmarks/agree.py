@@ -0,0 +1,59 @@
+import argparse
+import logging
+import sys
+from parsers import SentenceGenerator
+from parsers.batch import parse_all
+from .grammars import corpus
+from .run import KINDS
+
+# Differential check: every parser kind must accept the generated sentences of a grammar and
+# reject the near misses, which the generator has already checked against its GLR recognizer.
+
+
+def check(name, cfg, kinds, count, length, depth, seed):
+    generator = SentenceGenerator(cfg, seed=seed)
+    cases = [(sentence, True) for sentence in generator.sentences(count, length)]
+    cases += [(sentence, True) for sentence in generator.exhaustive(depth, length)]
+    cases += [(sentence, False) for sentence in generator.near_misses(count, length)]
+    failures = []
+    for kind_name in kinds:
+        try:
+            parser = KINDS[kind_name](cfg)
+        except ValueError as e:
+            print(f'{name:12} {kind_name:5} skipped: {e}', file=sys.stderr)
+            continue
+        results = parse_all(parser.table, (sentence for sentence, _ in cases))
+        wrong = [(sentence, expected) for (sentence, expected), result in zip(cases, results)
+                 if bool(result) != expected]
+        print(f'{name:12} {kind_name:5} {len(cases)} sentences, {len(wrong)} disagreements', file=sys.stderr)
+        failures += [(name, kind_name, sentence, expected) for sentence, expected in wrong]
+    return failures, generator.coverage()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check that all parser kinds agree on generated sentences')
+    parser.add_argument('--grammars', nargs='*', help='Grammar names to check (default: all)')
+    parser.add_argument('--kinds', nargs='*', default=list(KINDS), choices=list(KINDS))
+    parser.add_argument('--count', type=int, default=500, help='Random valid and invalid sentences per grammar')
+    parser.add_argument('--length', type=int, default=30, help='Target sentence length in tokens')
+    parser.add_argument('--depth', type=int, default=4, help='Depth for the exhaustive sentences')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--quick', action='store_true', help='Smaller synthetic grammars')
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.CRITICAL)
+    grammars = corpus(args.quick)
+    if args.grammars:
+        grammars = {name: grammars[name] for name in args.grammars}
+    failures = []
+    for name, (cfg, _) in grammars.items():
+        found, coverage = check(name, cfg, args.kinds, args.count, args.length, args.depth, args.seed)
+        print(f'{name:12} production coverage {coverage:.0%}', file=sys.stderr)
+        failures += found
+    for name, kind_name, sentence, expected in failures[:20]:
+        print(f'DISAGREE {name} {kind_name} expected {"accept" if expected else "reject"}: {" ".join(sentence)}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
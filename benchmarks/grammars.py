@@ -0,0 +1,169 @@
+# Benchmark corpus: each entry is (cfg, make_input) where make_input(n) returns a valid token
+# list of roughly n tokens.
+
+SIMPLE = {
+    "S'": [('S',)],
+    'S': [('S', 'A'), ('S', 'B'), ('a',)],
+    'A': [('S', '+')],
+    'B': [('S', '-')]
+}
+
+EXPRESSION = {
+    "S'": [('E',)],
+    'E': [('E', '+', 'T'), ('E', '-', 'T'), ('T',)],
+    'T': [('T', '*', 'F'), ('T', '/', 'F'), ('F',)],
+    'F': [('(', 'E', ')'), ('id',), ('num',)],
+}
+
+JSON = {
+    "S'": [('VALUE',)],
+    'VALUE': [('OBJECT',), ('ARRAY',), ('string',), ('number',), ('true',), ('false',), ('null',)],
+    'OBJECT': [('{', '}'), ('{', 'MEMBERS', '}')],
+    'MEMBERS': [('PAIR',), ('MEMBERS', ',', 'PAIR')],
+    'PAIR': [('string', ':', 'VALUE')],
+    'ARRAY': [('[', ']'), ('[', 'ELEMENTS', ']')],
+    'ELEMENTS': [('VALUE',), ('ELEMENTS', ',', 'VALUE')],
+}
+
+PASCAL = {
+    "S'": [('PROGRAM',)],
+    'PROGRAM': [('program', 'id', ';', 'BLOCK', '.')],
+    'BLOCK': [('VARS', 'COMPOUND'), ('COMPOUND',)],
+    'VARS': [('var', 'DECLS')],
+    'DECLS': [('DECLS', 'DECL'), ('DECL',)],
+    'DECL': [('IDS', ':', 'TYPE', ';')],
+    'IDS': [('IDS', ',', 'id'), ('id',)],
+    'TYPE': [('integer',), ('boolean',), ('array', '[', 'num', '..', 'num', ']', 'of', 'TYPE')],
+    'COMPOUND': [('begin', 'STMTS', 'end')],
+    'STMTS': [('STMTS', ';', 'STMT'), ('STMT',)],
+    'STMT': [
+        ('id', ':=', 'EXPR'), ('id', '[', 'EXPR', ']', ':=', 'EXPR'), ('COMPOUND',),
+        ('if', 'EXPR', 'then', 'STMT', 'else', 'STMT'), ('while', 'EXPR', 'do', 'STMT'),
+    ],
+    'EXPR': [('SIMPLE', 'RELOP', 'SIMPLE'), ('SIMPLE',)],
+    'RELOP': [('=',), ('<',), ('>',)],
+    'SIMPLE': [('SIMPLE', '+', 'TERM'), ('SIMPLE', '-', 'TERM'), ('SIMPLE', 'or', 'TERM'), ('TERM',)],
+    'TERM': [('TERM', '*', 'FACTOR'), ('TERM', 'div', 'FACTOR'), ('TERM', 'and', 'FACTOR'), ('FACTOR',)],
+    'FACTOR': [('id',), ('num',), ('(', 'EXPR', ')'), ('not', 'FACTOR'), ('id', '[', 'EXPR', ']')],
+}
+
+C_SUBSET = {
+    "S'": [('UNIT',)],
+    'UNIT': [('UNIT', 'DECL'), ('DECL',)],
+    'DECL': [('TYPE', 'id', ';'), ('TYPE', 'id', '(', 'PARAMS', ')', 'BLOCK'), ('TYPE', 'id', '(', ')', 'BLOCK')],
+    'TYPE': [('int',), ('char',), ('void',), ('TYPE', '*')],
+    'PARAMS': [('TYPE', 'id'), ('PARAMS', ',', 'TYPE', 'id')],
+    'BLOCK': [('{', 'STMTS', '}'), ('{', '}')],
+    'STMTS': [('STMTS', 'STMT'), ('STMT',)],
+    'STMT': [
+        ('EXPR', ';'), ('BLOCK',), ('TYPE', 'id', ';'), ('return', 'EXPR', ';'), ('return', ';'),
+        ('if', '(', 'EXPR', ')', 'BLOCK'), ('if', '(', 'EXPR', ')', 'BLOCK', 'else', 'BLOCK'),
+        ('while', '(', 'EXPR', ')', 'STMT'),
+    ],
+    'EXPR': [('UNARY', '=', 'EXPR'), ('OR',)],
+    'OR': [('OR', '||', 'AND'), ('AND',)],
+    'AND': [('AND', '&&', 'EQ'), ('EQ',)],
+    'EQ': [('EQ', '==', 'REL'), ('EQ', '!=', 'REL'), ('REL',)],
+    'REL': [('REL', '<', 'ADD'), ('REL', '>', 'ADD'), ('ADD',)],
+    'ADD': [('ADD', '+', 'MUL'), ('ADD', '-', 'MUL'), ('MUL',)],
+    'MUL': [('MUL', '*', 'UNARY'), ('MUL', '/', 'UNARY'), ('UNARY',)],
+    'UNARY': [('-', 'UNARY'), ('!', 'UNARY'), ('*', 'UNARY'), ('&', 'UNARY'), ('POSTFIX',)],
+    'POSTFIX': [('POSTFIX', '[', 'EXPR', ']'), ('POSTFIX', '(', 'ARGS', ')'), ('POSTFIX', '(', ')'), ('PRIMARY',)],
+    'ARGS': [('EXPR',), ('ARGS', ',', 'EXPR')],
+    'PRIMARY': [('id',), ('num',), ('string',), ('(', 'EXPR', ')')],
+}
+
+
+def repeat(head, body, tail, n):
+    tokens = list(head)
+    while len(tokens) + len(tail) < n:
+        tokens += body
+    return tokens + list(tail)
+
+
+def simple_input(n):
+    return repeat(['a'], ['a', '+', 'a', '-'], [], n)
+
+
+def expression_input(n):
+    return repeat(['id'], ['+', 'num', '*', '(', 'id', '-', 'id', ')', '/', 'num'], [], n)
+
+
+def json_input(n):
+    item = ['{', 'string', ':', 'number', ',', 'string', ':', '[', 'true', ',', 'null', ']', '}']
+    return repeat(['[', 'string'], [','] + item, [']'], n)
+
+
+def pascal_input(n):
+    head = ['program', 'id', ';', 'var', 'id', ',', 'id', ':', 'integer', ';', 'begin', 'id', ':=', 'num']
+    body = [';', 'while', 'id', '<', 'num', 'do', 'id', ':=', 'id', '+', 'num', '*', '(', 'id', '-', 'num', ')']
+    return repeat(head, body, ['end', '.'], n)
+
+
+def c_input(n):
+    body = ['int', 'id', '(', 'int', 'id', ',', 'char', '*', 'id', ')', '{',
+            'id', '=', 'id', '+', 'num', '*', 'id', '(', 'id', ',', 'num', ')', ';',
+            'if', '(', 'id', '<', 'num', ')', '{', 'return', 'id', ';', '}', 'else', '{', 'return', ';', '}', '}']
+    return repeat([], body, [], n)
+
+
+def levels(n):
+    # Synthetic: n left-associative binary operator levels, like a stratified expression grammar
+    cfg = {
+        "S'": [('P',)],
+        'P': [('P', 'ST'), ('ST',)],
+        'ST': [('E0', ';'), ('{', 'P', '}'), ('while', '(', 'E0', ')', 'ST')],
+    }
+    for i in range(n):
+        cfg[f'E{i}'] = [(f'E{i}', f'op{i}', f'E{i + 1}'), (f'E{i}', f'op{i}b', f'E{i + 1}'), (f'E{i + 1}',)]
+    cfg[f'E{n}'] = [('id',), ('num',), ('(', 'E0', ')'), ('-', f'E{n}'), ('id', '(', 'ARGS', ')')]
+    cfg['ARGS'] = [('E0',), ('ARGS', ',', 'E0')]
+    return cfg
+
+
+def levels_input(levels_count):
+    def make(n):
+        body = ['id']
+        for i in range(levels_count):
+            body += [f'op{i}', 'num' if i % 2 else 'id']
+        return repeat([], body + [';'], [], n)
+    return make
+
+
+def wide(n):
+    # Synthetic: n statement forms sharing one expression grammar
+    cfg = {
+        "S'": [('P',)],
+        'P': [('P', 'ST'), ('ST',)],
+        'ST': [(f'kw{i}', 'E', ';') for i in range(n)] + [(f'kw{i}', '(', 'E', ')', 'ST') for i in range(n)],
+        'E': [('E', '+', 'T'), ('T',)],
+        'T': [('T', '*', 'F'), ('F',)],
+        'F': [('id',), ('(', 'E', ')')],
+    }
+    return cfg
+
+
+def wide_input(count):
+    def make(n):
+        tokens = []
+        i = 0
+        while len(tokens) < n:
+            tokens += [f'kw{i % count}', '(', 'id', ')', f'kw{(i + 1) % count}', 'id', '+', 'id', '*', 'id', ';']
+            i += 1
+        return tokens
+    return make
+
+
+def corpus(quick=False):
+    grammars = {
+        'simple': (SIMPLE, simple_input),
+        'expression': (EXPRESSION, expression_input),
+        'json': (JSON, json_input),
+        'pascal': (PASCAL, pascal_input),
+        'c-subset': (C_SUBSET, c_input),
+    }
+    for n in ((5, 10) if quick else (5, 10, 20, 40)):
+        grammars[f'levels-{n}'] = (levels(n), levels_input(n))
+    for n in ((25,) if quick else (25, 100, 200)):
+        grammars[f'wide-{n}'] = (wide(n), wide_input(n))
+    return grammars
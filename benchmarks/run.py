@@ -0,0 +1,191 @@
+import argparse
+import gc
+import json
+import logging
+import platform
+import sys
+import time
+import tracemalloc
+from parsers import SLRParser, CLRParser, LALRParser, PGMParser, Profiler, SentenceGenerator
+from .grammars import corpus
+
+KINDS = {'SLR': SLRParser, 'CLR': CLRParser, 'LALR': LALRParser, 'PGM': PGMParser}
+PHASES = ('first', 'follow', 'states', 'tables')
+PROFILED_TOKENS = 20000
+
+
+def measure_build(kind, cfg, repeat):
+    # Best of `repeat` untraced builds for timings, then one traced build for peak memory
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        parser = kind(cfg)
+        total = time.perf_counter() - start
+        if best is None or total < best[0]:
+            best = (total, parser)
+    total, parser = best
+    gc.collect()
+    tracemalloc.start()
+    kind(cfg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return parser, total, peak
+
+
+def measure_parse(parser, tokens, repeat):
+    ids = list(parser.table.encode(tokens))
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        accepted = parser.parse_ids(ids)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return accepted, best
+
+
+def reductions_per_token(parser, tokens):
+    # Counted on a prefix through the profiled parse path, which is slower than parse_ids
+    tokens = tokens[:PROFILED_TOKENS]
+    parser.profiler = Profiler()
+    try:
+        parser.parse(tokens)
+        return parser.profiler.counters['reductions'] / len(tokens)
+    finally:
+        parser.profiler = None
+
+
+def measure_optimized(parser, tokens, repeat):
+    optimized = parser.optimized()
+    accepted, elapsed = measure_parse(optimized, tokens, repeat)
+    stats = optimized.stats['optimize']
+    return {
+        'layout': stats['layout'],
+        'states': stats['states_after'],
+        'table_bytes': stats['bytes_after'],
+        'unit_productions': stats['unit_productions'],
+        'bypassed_transitions': stats['bypassed_transitions'],
+        'reductions_per_token': reductions_per_token(optimized, tokens),
+        'accepted': bool(accepted),
+        'tokens_per_second': len(tokens) / elapsed if elapsed else None,
+    }
+
+
+def run(grammars, kinds, repeat, input_tokens, optimize=False, generated=False):
+    # `generated`: parse a random sentence of the grammar instead of its hand-written input
+    results = []
+    for name, (cfg, make_input) in grammars.items():
+        tokens = SentenceGenerator(cfg, seed=0).sentence(input_tokens) if generated else make_input(input_tokens)
+        for kind_name in kinds:
+            entry = {'grammar': name, 'kind': kind_name, 'productions': sum(len(p) for p in cfg.values())}
+            try:
+                parser, total, peak = measure_build(KINDS[kind_name], cfg, repeat)
+            except ValueError as e:
+                entry['error'] = str(e)
+                results.append(entry)
+                print(f'{name:12} {kind_name:5} error: {e}', file=sys.stderr)
+                continue
+            accepted, elapsed = measure_parse(parser, tokens, repeat)
+            stats = parser.stats
+            entry.update({
+                'states': stats['states'],
+                'action_entries': stats['action_entries'],
+                'goto_entries': stats['goto_entries'],
+                'table_bytes': stats['table_bytes'],
+                'phases': {phase: stats[f'{phase}_time'] for phase in PHASES},
+                'build_time': total,
+                'peak_memory': peak,
+                'parse': {
+                    'tokens': len(tokens),
+                    'accepted': bool(accepted),
+                    'seconds': elapsed,
+                    'tokens_per_second': len(tokens) / elapsed if elapsed else None,
+                },
+            })
+            results.append(entry)
+            print(f'{name:12} {kind_name:5} states={entry["states"]:6} build={total:8.4f}s '
+                  f'peak={peak / 1024:9.0f}KiB parse={entry["parse"]["tokens_per_second"] or 0:12.0f} tok/s',
+                  file=sys.stderr)
+            if optimize:
+                entry['parse']['reductions_per_token'] = reductions_per_token(parser, tokens)
+                optimized = entry['optimized'] = measure_optimized(parser, tokens, repeat)
+                print(f'{"":12} {"opt":5} states={optimized["states"]:6} '
+                      f'reductions/token={entry["parse"]["reductions_per_token"]:.2f}->{optimized["reductions_per_token"]:.2f} '
+                      f'parse={optimized["tokens_per_second"] or 0:12.0f} tok/s', file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # A run regresses when it builds or parses more than `tolerance` slower, uses more than
+    # `tolerance` more peak memory, or produces a different automaton than the baseline
+    previous = {(r['grammar'], r['kind']): r for r in baseline['results']}
+    regressions = []
+    for r in results:
+        old = previous.get((r['grammar'], r['kind']))
+        if old is None or 'error' in r or 'error' in old:
+            if old is not None and ('error' in r) != ('error' in old):
+                regressions.append((r['grammar'], r['kind'], 'error', old.get('error'), r.get('error')))
+            continue
+        checks = [
+            ('build_time', old['build_time'], r['build_time'], r['build_time'] > old['build_time'] * (1 + tolerance)),
+            ('peak_memory', old['peak_memory'], r['peak_memory'], r['peak_memory'] > old['peak_memory'] * (1 + tolerance)),
+            ('tokens_per_second', old['parse']['tokens_per_second'], r['parse']['tokens_per_second'],
+             r['parse']['tokens_per_second'] * (1 + tolerance) < old['parse']['tokens_per_second']),
+            ('states', old['states'], r['states'], r['states'] != old['states']),
+            ('accepted', old['parse']['accepted'], r['parse']['accepted'], r['parse']['accepted'] != old['parse']['accepted']),
+        ]
+        for metric, before, after, regressed in checks:
+            if regressed:
+                regressions.append((r['grammar'], r['kind'], metric, before, after))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark SLR/CLR/LALR/PGM construction and parsing')
+    parser.add_argument('--grammars', nargs='*', help='Grammar names to run (default: all)')
+    parser.add_argument('--kinds', nargs='*', default=list(KINDS), choices=list(KINDS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tokens', type=int, default=50000, help='Approximate input size for parse throughput')
+    parser.add_argument('--quick', action='store_true', help='Smaller synthetic grammars')
+    parser.add_argument('--optimize', action='store_true', help='Also measure the optimized tables')
+    parser.add_argument('--generated', action='store_true', help='Parse generated sentences instead of the fixed inputs')
+    parser.add_argument('--output', help='Write JSON results here instead of stdout')
+    parser.add_argument('--baseline', help='Compare against a previous JSON result')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.CRITICAL)
+    grammars = corpus(args.quick)
+    if args.grammars:
+        grammars = {name: grammars[name] for name in args.grammars}
+    results = run(grammars, args.kinds, args.repeat, args.tokens, args.optimize, args.generated)
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'repeat': args.repeat,
+            'generated': args.generated,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for grammar, kind, metric, before, after in regressions:
+            print(f'REGRESSION {grammar} {kind} {metric}: {before} -> {after}', file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,135 @@
+import queue
+import threading
 import tkinter as tk
+from collections import OrderedDict
+from itertools import chain
 from tkinter import ttk, messagebox
 from functools import partial
+from parsers.grammar import parse_cfg, parse_precedence
+from parsers.lexer import Lexer
+from parsers.push import PushParser
+from parsers.instrument import Profiler
+from parsers.rebuild import edit_cfg, cfg_diff
+
+# Built parsers kept per (grammar text, parser kind)
+CACHE_SIZE = 8
+# Parse steps are sent to the Text widget this many lines at a time
+STEP_BATCH = 1000
+# Work posted by the build/parse thread is picked up this often (ms), at most this many
+# messages at a time, so a long parse cannot starve the event loop
+POLL_INTERVAL = 50
+POLL_MESSAGES = 20
+# Marks the end of the token stream in parse_steps; None is what the lexer yields for unmatched text
+END_OF_INPUT = object()
+
+
+class Cancelled(Exception):
+    pass
+
+
+class TableGrid(ttk.Frame):
+    # State x symbol grid that only draws the cells in view, so tables with thousands of
+    # states open at once and scroll at the same speed as small ones. `cell(state, column)`
+    # gives the text of a cell, `describe(state, column)` the status line under the pointer.
+    ROW_HEIGHT = 22
+    COLUMN_WIDTH = 72
+    HEADER_WIDTH = 64
+
+    def __init__(self, master, cell, describe):
+        super().__init__(master)
+        self.cell = cell
+        self.describe = describe
+        self.rows = 0
+        self.columns = []
+        self.top = 0
+        self.left = 0
+        self.canvas = tk.Canvas(self, background="white", highlightthickness=0)
+        self.vbar = ttk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.hbar = ttk.Scrollbar(self, orient="horizontal", command=self.xview)
+        self.status = ttk.Label(self, anchor="w", font=("Courier", 10))
+        self.canvas.grid(row=0, column=0, sticky="nsew")
+        self.vbar.grid(row=0, column=1, sticky="ns")
+        self.hbar.grid(row=1, column=0, sticky="ew")
+        self.status.grid(row=2, column=0, columnspan=2, sticky="ew")
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+        self.canvas.bind("<Configure>", lambda event: self.redraw())
+        self.canvas.bind("<Motion>", self.on_motion)
+        self.canvas.bind("<MouseWheel>", lambda event: self.yview("scroll", -3 if event.delta > 0 else 3, "units"))
+        self.canvas.bind("<Shift-MouseWheel>", lambda event: self.xview("scroll", -1 if event.delta > 0 else 1, "units"))
+        self.canvas.bind("<Button-4>", lambda event: self.yview("scroll", -3, "units"))
+        self.canvas.bind("<Button-5>", lambda event: self.yview("scroll", 3, "units"))
+
+    def show(self, rows, columns):
+        self.rows = rows
+        self.columns = columns
+        self.top = 0
+        self.left = 0
+        self.redraw()
+
+    def page(self):
+        # Rows and columns that fit in the canvas
+        rows = max(1, self.canvas.winfo_height() // self.ROW_HEIGHT - 1)
+        columns = max(1, (self.canvas.winfo_width() - self.HEADER_WIDTH) // self.COLUMN_WIDTH)
+        return rows, columns
+
+    @staticmethod
+    def move(first, total, page, args):
+        # Scrollbar commands: ("moveto", fraction) or ("scroll", n, "units" | "pages")
+        if args[0] == "moveto":
+            first = int(float(args[1]) * total)
+        else:
+            first += int(args[1]) * (page if args[2] == "pages" else 1)
+        return max(0, min(first, total - page))
+
+    @staticmethod
+    def fraction(first, total, page):
+        if not total:
+            return 0, 1
+        return first / total, min(1, (first + page) / total)
+
+    def yview(self, *args):
+        self.top = self.move(self.top, self.rows, self.page()[0], args)
+        self.redraw()
+
+    def xview(self, *args):
+        self.left = self.move(self.left, len(self.columns), self.page()[1], args)
+        self.redraw()
+
+    def redraw(self):
+        canvas = self.canvas
+        canvas.delete("all")
+        page_rows, page_columns = self.page()
+        rows = range(self.top, min(self.rows, self.top + page_rows))
+        columns = range(self.left, min(len(self.columns), self.left + page_columns))
+        h, w, x0 = self.ROW_HEIGHT, self.COLUMN_WIDTH, self.HEADER_WIDTH
+        width = x0 + w * len(columns)
+        height = h * (len(rows) + 1)
+        canvas.create_rectangle(0, 0, width, h, fill="#e8e8e8", outline="")
+        canvas.create_rectangle(0, 0, x0, height, fill="#e8e8e8", outline="")
+        font = ("Courier", 10)
+        for k, c in enumerate(columns):
+            x = x0 + k * w
+            canvas.create_line(x, 0, x, height, fill="#d0d0d0")
+            canvas.create_text(x + w // 2, h // 2, text=self.columns[c], font=("Courier", 10, "bold"))
+        for k, state in enumerate(rows):
+            y = (k + 1) * h
+            canvas.create_line(0, y, width, y, fill="#d0d0d0")
+            canvas.create_text(x0 // 2, y + h // 2, text=str(state), font=("Courier", 10, "bold"))
+            for j, c in enumerate(columns):
+                text = self.cell(state, c)
+                if text:
+                    canvas.create_text(x0 + j * w + w // 2, y + h // 2, text=text, font=font)
+        self.vbar.set(*self.fraction(self.top, self.rows, page_rows))
+        self.hbar.set(*self.fraction(self.left, len(self.columns), page_columns))
+
+    def on_motion(self, event):
+        row = self.top + event.y // self.ROW_HEIGHT - 1
+        column = self.left + (event.x - self.HEADER_WIDTH) // self.COLUMN_WIDTH
+        if event.y >= self.ROW_HEIGHT and event.x >= self.HEADER_WIDTH and row < self.rows and column < len(self.columns):
+            self.status.config(text=self.describe(row, column))
+        else:
+            self.status.config(text="")
 
 class ParserUI:
     def __init__(self, root, parsers, default_cfg):
@@ -8,16 +137,23 @@ class ParserUI:
         self.parsers = parsers
         self.default_cfg = default_cfg
         self.current_parser = None
+        self.current_precedence = None
+        self.current_key = None
         self.parser_class = None
+        self.parser_cache = OrderedDict()
+        self.table = None
+        self.worker = None
+        self.cancel_event = None
+        self.messages = queue.Queue()
 
-        root.title("Parser UI: SLR, CLR, LALR")
+        root.title("Parser UI: SLR, CLR, LALR, PGM")
         root.geometry("900x700")
         root.resizable(False, False)
         root.configure(bg="#f5f5f5")
 
         ttk.Label(
             root,
-            text="Parser UI: SLR, CLR, LALR",
+            text="Parser UI: SLR, CLR, LALR, PGM",
             font=("Helvetica", 20, "bold"),
             background="#f5f5f5",
             foreground="#333"
@@ -49,8 +185,14 @@ class ParserUI:
         ttk.Label(self.input_frame, text="Input String:", font=("Helvetica", 12)).grid(row=0, column=0, padx=5, pady=5)
         self.input_entry = ttk.Entry(self.input_frame, width=50, font=("Helvetica", 10))
         self.input_entry.grid(row=0, column=1, padx=10, pady=5)
-        parse_button = ttk.Button(self.input_frame, text="Parse", command=self.run_parser)
-        parse_button.grid(row=0, column=2, padx=10, pady=5)
+        self.parse_button = ttk.Button(self.input_frame, text="Parse", command=self.run_parser)
+        self.parse_button.grid(row=0, column=2, padx=10, pady=5)
+        self.cancel_button = ttk.Button(self.input_frame, text="Cancel", command=self.cancel, state="disabled")
+        self.cancel_button.grid(row=0, column=3, padx=5, pady=5)
+        self.progress = ttk.Progressbar(self.input_frame, mode="indeterminate", length=200)
+        self.progress.grid(row=1, column=1, padx=10, sticky="w")
+        self.status_label = ttk.Label(self.input_frame, text="", font=("Helvetica", 10))
+        self.status_label.grid(row=1, column=1, columnspan=3, padx=10, sticky="e")
 
         self.output_tabs = ttk.Notebook(root)
         self.output_tabs.pack(padx=10, pady=10, fill="both", expand=True)
@@ -65,32 +207,16 @@ class ParserUI:
         self.steps_text = tk.Text(self.steps_tab, state="disabled", wrap="word", font=("Courier", 12))
         self.steps_text.pack(padx=10, pady=10, fill="both", expand=True)
 
-        self.action_tree = ttk.Treeview(
-            self.action_table_tab,
-            columns=("State", "Symbol", "Action"),
-            show="headings"
-        )
-        self.action_tree.heading("State", text="State")
-        self.action_tree.heading("Symbol", text="Symbol")
-        self.action_tree.heading("Action", text="Action")
-        self.action_tree.pack(padx=10, pady=10, fill="both", expand=True)
-
-        self.goto_tree = ttk.Treeview(
-            self.goto_table_tab,
-            columns=("State", "Symbol", "Goto"),
-            show="headings"
-        )
-        self.goto_tree.heading("State", text="State")
-        self.goto_tree.heading("Symbol", text="Symbol")
-        self.goto_tree.heading("Goto", text="Goto")
-        self.goto_tree.pack(padx=10, pady=10, fill="both", expand=True)
+        self.action_grid = TableGrid(self.action_table_tab, self.action_cell, self.describe_action)
+        self.action_grid.pack(padx=10, pady=10, fill="both", expand=True)
+        self.goto_grid = TableGrid(self.goto_table_tab, self.goto_cell, self.describe_goto)
+        self.goto_grid.pack(padx=10, pady=10, fill="both", expand=True)
 
         self.on_parser_change()
 
         style = ttk.Style()
         style.configure("My.TLabelframe", background="#f5f5f5", font=("Helvetica", 12, "bold"))
         style.configure("TButton", font=("Helvetica", 10))
-        style.configure("Treeview.Heading", font=("Helvetica", 10, "bold"))
 
     def format_cfg(self, cfg):
         formatted = ""
@@ -103,100 +229,241 @@ class ParserUI:
         self.parser_class = self.parsers[parser_name]
 
     def run_parser(self):
+        # Reads the inputs here, then builds and parses on a worker thread; poll() shows what it
+        # posts. The UI stays usable throughout, and Cancel stops the build or the parse.
+        if self.worker is not None:
+            return
+        input_string = self.input_entry.get().strip()
+        if not input_string:
+            messagebox.showerror("Error", "Input string cannot be empty.")
+            return
+        grammar_text = self.grammar_text.get("1.0", "end").strip()
         try:
-            input_string = self.input_entry.get().strip()
-            if not input_string:
-                messagebox.showerror("Error", "Input string cannot be empty.")
-                return
-
-            grammar_text = self.grammar_text.get("1.0", "end").strip()
             cfg = self.parse_cfg(grammar_text)
-
-            self.current_parser = self.parser_class(cfg)
-
-            self.clear_output()
-
-            self.fill_action_table()
-            self.fill_goto_table()
-            self.run_and_display_steps(input_string)
+            precedence = self.parse_precedence(grammar_text)
         except Exception as e:
             messagebox.showerror("Error", str(e))
+            return
+
+        self.clear_output()
+        self.cancel_event = threading.Event()
+        key = (grammar_text, self.parser_selection.get())
+        self.worker = threading.Thread(
+            target=self.work, args=(key, cfg, precedence, input_string, self.cancel_event), daemon=True
+        )
+        self.parse_button.config(state="disabled")
+        self.cancel_button.config(state="normal")
+        self.progress.start(10)
+        self.status_label.config(text="Building parser...")
+        self.worker.start()
+        self.root.after(POLL_INTERVAL, self.poll)
+
+    def cancel(self):
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+
+    def work(self, key, cfg, precedence, input_string, cancel):
+        # Worker thread: never touches Tk, everything goes through self.messages
+        post = self.messages.put
+        try:
+            parser = self.cached_parser(key, cfg, precedence, cancel)
+            post(("table", parser.table))
+            self.parse_steps(parser, input_string, cancel)
+        except Cancelled:
+            post(("done", "Cancelled"))
+        except Exception as e:
+            post(("error", str(e)))
+
+    def cached_parser(self, key, cfg, precedence, cancel):
+        parser = self.parser_cache.get(key)
+        if parser is not None:
+            self.parser_cache.move_to_end(key)
+        else:
+            parser = self.build_parser(cfg, precedence, self.build_profiler(cancel))
+            parser.profiler = None
+            if parser is self.current_parser:
+                # Edited in place: the old grammar text no longer describes it
+                self.parser_cache.pop(self.current_key, None)
+            self.parser_cache[key] = parser
+            while len(self.parser_cache) > CACHE_SIZE:
+                self.parser_cache.popitem(last=False)
+        self.current_parser = parser
+        self.current_precedence = precedence
+        self.current_key = key
+        return parser
+
+    def build_profiler(self, cancel):
+        # Construction progress: phases as they start and a state count every 256 states.
+        # Raising Cancelled from here aborts the build; an in-place edit then restores the parser.
+        post = self.messages.put
+
+        def callback(event, *args):
+            if cancel.is_set():
+                raise Cancelled()
+            if event == "phase":
+                post(("progress", f"Building parser: {args[0]}"))
+            elif event == "state" and args[0] % 256 == 0:
+                post(("progress", f"Building parser: {args[0]} states"))
+
+        return Profiler(callback)
+
+    def build_parser(self, cfg, precedence, profiler=None):
+        # Grammar edits that only add or remove productions update the current parser in place;
+        # anything else (another parser, other precedence, reordered productions) builds a new one
+        parser = self.current_parser
+        if (parser is None or type(parser) is not self.parser_class or precedence != self.current_precedence
+                or cfg.get("S'") != parser.cfg["S'"]):
+            return self.parser_class(cfg, precedence=precedence, profiler=profiler)
+        add, remove = cfg_diff(parser.cfg, cfg)
+        if not add and not remove and list(parser.cfg.items()) == list(cfg.items()):
+            return parser
+        try:
+            edited, _ = edit_cfg(parser.cfg, add, remove)
+        except ValueError:
+            return self.parser_class(cfg, precedence=precedence, profiler=profiler)
+        if list(edited.items()) != list(cfg.items()):
+            return self.parser_class(cfg, precedence=precedence, profiler=profiler)
+        parser.profiler = profiler
+        try:
+            return parser.edit_grammar(add, remove)
+        finally:
+            parser.profiler = None
 
     def parse_cfg(self, grammar_text):
-        cfg = {}
-        for line in grammar_text.splitlines():
-            line = line.strip()
-            if not line or "->" not in line:
-                continue
-            head, productions = line.split("->", 1)
-            head = head.strip()
-            production_list = [tuple(prod.strip().split()) for prod in productions.split("|")]
-            cfg[head] = production_list
-        return cfg
+        return parse_cfg(grammar_text)
+
+    def parse_precedence(self, grammar_text):
+        return parse_precedence(grammar_text)
 
     def clear_output(self):
         self.steps_text.config(state="normal")
         self.steps_text.delete("1.0", "end")
         self.steps_text.config(state="disabled")
 
-        for tree in [self.action_tree, self.goto_tree]:
-            for item in tree.get_children():
-                tree.delete(item)
-
-    def fill_action_table(self):
-        for (state, symbol), (op, val) in self.current_parser.action.items():
-            self.action_tree.insert("", "end", values=(state, symbol, f"{op} {val}"))
-
-    def fill_goto_table(self):
-        for (state, symbol), target in self.current_parser.goto.items():
-            self.goto_tree.insert("", "end", values=(state, symbol, target))
-
-    def run_and_display_steps(self, input_string):
-        def log_step(message):
+    def poll(self):
+        # Main thread: applies what the worker posted since the last tick
+        steps = []
+        finished = None
+        for _ in range(POLL_MESSAGES):
+            try:
+                message = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            kind = message[0]
+            if kind == "steps":
+                steps.append(message[1])
+            elif kind == "progress":
+                self.status_label.config(text=message[1])
+            elif kind == "table":
+                self.show_table(message[1])
+                self.status_label.config(text="Parsing...")
+            else:
+                finished = message
+                break
+        if steps:
             self.steps_text.config(state="normal")
-            self.steps_text.insert("end", message + "\n")
+            self.steps_text.insert("end", "".join(steps))
             self.steps_text.config(state="disabled")
-
-        log_step("Parsing Input: " + input_string)
-        stack = [0]
-        input_string += "$"
-        index = 0
-
-        while True:
-            state = stack[-1]
-            symbol = input_string[index]
-            action = self.current_parser.action.get((state, symbol))
-            if action is None:
-                log_step(f"Error: No action for state {state}, symbol {symbol}")
-                return
-            op, val = action
-            if op == "s":
-                stack.append(val)
-                index += 1
-                log_step(f"Shift to state {val}")
-            elif op == "r":
-                left, production = val
-                for _ in production:
-                    stack.pop()
-                state = stack[-1]
-                goto_state = self.current_parser.goto.get((state, left))
-                if goto_state is None:
-                    log_step(f"Error: No goto for state {state}, symbol {left}")
-                    return
-                stack.append(goto_state)
-                log_step(f"Reduce by {left} -> {' '.join(production)}")
-            elif op == "acc":
-                log_step("Accepted")
-                return
+        if finished is None:
+            self.root.after(POLL_INTERVAL, self.poll)
+            return
+        self.worker = None
+        self.cancel_event = None
+        self.progress.stop()
+        self.parse_button.config(state="normal")
+        self.cancel_button.config(state="disabled")
+        if finished[0] == "error":
+            self.status_label.config(text="Error")
+            messagebox.showerror("Error", finished[1])
+        else:
+            self.status_label.config(text=finished[1])
+
+    def show_table(self, table):
+        if table is self.table:
+            return
+        self.table = table
+        self.action_grid.show(table.n_states, table.terminals)
+        self.goto_grid.show(table.n_states, table.nonterminals[1:])
+
+    def action_cell(self, state, column):
+        code = self.table.action_entry(state, column)
+        if code is None:
+            return ""
+        op, val = self.table.decode(code)
+        if op == "s":
+            return f"s{val}"
+        if op == "r":
+            return f"r{-code - 1}"
+        return op
+
+    def describe_action(self, state, column):
+        table = self.table
+        symbol = table.terminals[column]
+        code = table.action_entry(state, column)
+        if code is None:
+            return f"state {state}, {symbol}: no action"
+        op, val = table.decode(code)
+        if op == "s":
+            return f"state {state}, {symbol}: shift to state {val}"
+        if op == "r":
+            left, production = val
+            return f"state {state}, {symbol}: reduce by r{-code - 1} {left} -> {' '.join(production)}"
+        return f"state {state}, {symbol}: {'accept' if op == 'acc' else 'error'}"
+
+    def goto_cell(self, state, column):
+        target = self.table.lookup_goto(state, column + 1)
+        return "" if target is None else str(target)
+
+    def describe_goto(self, state, column):
+        symbol = self.table.nonterminals[column + 1]
+        target = self.table.lookup_goto(state, column + 1)
+        return f"state {state}, {symbol}: " + ("no goto" if target is None else f"goto state {target}")
+
+    def parse_steps(self, parser, input_string, cancel):
+        # Worker thread: drives the table through PushParser and posts the step log in batches
+        post = self.messages.put
+        lines = ["Parsing Input: " + input_string]
+        lexer = Lexer.from_terminals(parser.table.terminals)
+        push = PushParser(parser)
+        unknown = len(parser.table.terminals)
+        for token in chain(lexer.scan(input_string), [END_OF_INPUT]):
+            if token is END_OF_INPUT:
+                events = push.finish()
+            elif token[0] is None:
+                # Unmatched text goes in as a terminal no row has, so it is rejected where it is
+                events = push.feed_id(unknown, input_string[token[1]:token[2]])
+            else:
+                events = push.feed(token[0])
+            for event in events:
+                kind = event[0]
+                if kind == "shift":
+                    lines.append(f"Shift to state {event[2]}")
+                elif kind == "reduce":
+                    lines.append(f"Reduce by {event[1]} -> {' '.join(event[2])}")
+                elif kind == "accept":
+                    lines.append("Accepted")
+                else:
+                    lines.append(f"Error: No action for state {event[1]}, symbol {event[2]} at token {push.error[0]}")
+            if len(lines) >= STEP_BATCH:
+                if cancel.is_set():
+                    raise Cancelled()
+                post(("steps", "\n".join(lines) + "\n"))
+                lines = []
+            if push.done:
+                break
+        if lines:
+            post(("steps", "\n".join(lines) + "\n"))
+        post(("done", "Accepted" if push.accepted else "Rejected"))
 
 
 if __name__ == "__main__":
-    from parsers import SLRParser, CLRParser, LALRParser
+    from parsers import SLRParser, CLRParser, LALRParser, PGMParser
 
     parsers = {
         "SLR": SLRParser,
         "CLR": CLRParser,
-        "LALR": LALRParser
+        "LALR": LALRParser,
+        "PGM": PGMParser
     }
 
     cfg = {
@@ -1,85 +1,46 @@
-import logging
 from .SLR import SLRParser
-from .symbols import is_terminal, is_non_terminal
+from .items import END, bits
 
 class CLRParser(SLRParser):
-    def build_closure(self, items):
-        closure = set(items)
-        while True:
-            new_items = set()
-            for (left, production, dot, lookahead) in closure:
-                if dot < len(production):
-                    symbol = production[dot]
-                    if is_non_terminal(symbol):
-                        for prod in self.cfg[symbol]:
-                            first_of_rest = self.first_of_sequence(production[dot + 1:] + (lookahead,))
-                            for terminal in first_of_rest:
-                                new_item = (symbol, prod, 0, terminal)
-                                if new_item not in closure:
-                                    new_items.add(new_item)
-            if not new_items:
-                break
-            closure.update(new_items)
-        return closure
+    goto_method = 'goto1'
 
-    def first_of_sequence(self, sequence):
-        result = set()
-        for symbol in sequence:
-            if is_terminal(symbol):
-                result.add(symbol)
-                break
-            result.update(self.first[symbol] - {'ε'})
-            if 'ε' not in self.first[symbol]:
-                break
-        else:
-            result.add('ε')
-        return result
+    @property
+    def item_width(self):
+        return self.items.n_terminals
 
-    def build_goto(self, state, symbol):
-        goto = set()
-        for (left, production, dot, lookahead) in state:
-            if dot < len(production) and production[dot] == symbol:
-                goto.add((left, production, dot + 1, lookahead))
-        return self.build_closure(goto)
+    def start_kernel(self):
+        return (self.items.prod_start[0] * self.item_width + self.items.terminal_index['$'],)
+
+    def closure(self, kernel):
+        return self.items.closure1(kernel)
+
+    def completed_items(self, i):
+        # (lr0 item, lookahead mask) pairs of the completed items of state i
+        items = self.items
+        kernel = self.kernels[i]
+        pairs = items.closure1_masks(kernel) if items.has_empty else items.kernel_masks(kernel)
+        return [(lr0, mask) for lr0, mask in pairs if items.item_next[lr0] == END]
 
     def build_states(self):
-        logging.debug('=========== Building states... ===========')
-        start_item = ("S'", self.cfg["S'"][0], 0, '$')
-        start_closure = self.build_closure({start_item})
-        self.states.append(start_closure)
-        logging.debug(f'State 0: {start_closure}')
-        states_added = True
-        while states_added:
-            states_added = False
-            for i, state in enumerate(self.states):
-                logging.debug(f'Processing state {i}...')
-                symbols = set()
-                for (left, production, dot, lookahead) in state:
-                    if dot < len(production):
-                        symbols.add(production[dot])
-                for symbol in symbols:
-                    goto_state = self.build_goto(state, symbol)
-                    if goto_state and goto_state not in self.states:
-                        self.states.append(goto_state)
-                        states_added = True
-                    self.transitions[(i, symbol)] = self.states.index(goto_state)
+        super().build_states()
+        self.stats['closure_hits'] = self.items.hits
+        self.stats['closure_misses'] = self.items.misses
+
+    def rebuild_states(self, edit):
+        super().rebuild_states(edit)
+        self.stats['closure_hits'] = self.items.hits
+        self.stats['closure_misses'] = self.items.misses
 
-    def build_action_goto(self):
-        for i, state in enumerate(self.states):
-            for (left, production, dot, lookahead) in state:
-                if dot < len(production):
-                    symbol = production[dot]
-                    if is_terminal(symbol):
-                        s = self.transitions.get((i, symbol))
-                        if s is not None:
-                            self.action[(i, symbol)] = ('s', s)
-                    else:
-                        s = self.transitions.get((i, symbol))
-                        if s is not None:
-                            self.goto[(i, symbol)] = s
-                else:
-                    if left == "S'":
-                        self.action[(i, '$')] = ('acc', None)
-                    else:
-                        if lookahead in self.follow[left]:
-                            self.action[(i, lookahead)] = ('r', (left, production))
\ No newline at end of file
+    def build_action_goto(self, states=None):
+        items = self.items
+        for i in range(len(self.kernels)) if states is None else states:
+            for lr0, mask in self.completed_items(i):
+                left, production = items.productions[items.item_prod[lr0]]
+                if left == "S'":
+                    self.add_reduce(i, '$', (left, production))
+                    continue
+                for lookahead in bits(mask):
+                    lookahead = items.terminals[lookahead]
+                    if lookahead in self.follow[left]:
+                        self.add_reduce(i, lookahead, (left, production))
+        self.build_shift_goto(states)
\ No newline at end of file
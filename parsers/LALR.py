@@ -1,106 +1,87 @@
-import logging 
-from .symbols import is_terminal, is_non_terminal
+from collections import deque
+from .SLR import SLRParser
 from .CLR import CLRParser
+from .items import END, bits
 
 class LALRParser(CLRParser):
-    def __init__(self, cfg):
-        self.states_raw = []  # To keep raw states before merging
-        super().__init__(cfg)
-        self.merge_states()
+    strict = True
 
-    def merge_states(self):
-        # Group states by their core (items without lookahead)
-        core_map = {}
-        for i, state in enumerate(self.states):
-            core = frozenset((left, production, dot) for (left, production, dot, _) in state)
-            if core not in core_map:
-                core_map[core] = []
-            core_map[core].append(i)
+    def build_states(self):
+        # Build the LR(0) automaton and attach lookaheads to its kernels instead of
+        # building the canonical LR(1) collection and merging states with equal cores
+        self.build_items()
+        lr0_kernels, self.state_index, self.transitions = self.build_automaton(SLRParser.start_kernel(self), 'goto0')
+        self.attach_lookaheads(lr0_kernels)
 
-        # Mapping from old state indices to new merged state indices
-        state_mapping = {}
-        new_states = []
-        for indices in core_map.values():
-            # Merge lookaheads for identical items
-            merged_items = {}
-            for index in indices:
-                for item in self.states[index]:
-                    key = (item[0], item[1], item[2])
-                    if key not in merged_items:
-                        merged_items[key] = set()
-                    merged_items[key].add(item[3])
-            # Convert back to set of items
-            new_state = set()
-            for key, lookaheads in merged_items.items():
-                for lookahead in lookaheads:
-                    new_state.add((*key, lookahead))
-            new_state_index = len(new_states)
-            for index in indices:
-                state_mapping[index] = new_state_index
-            new_states.append(new_state)
-        self.states = new_states
+    def rebuild_states(self, edit):
+        # The LR(0) automaton is updated incrementally; its kernels are the keys of state_index,
+        # in state order. Lookaheads are then propagated over the whole automaton again.
+        self.build_items()
+        lr0_kernels, self.state_index, self.transitions = edit.update_automaton(
+            list(edit.old['state_index']), edit.old['transitions'], 'goto0')
+        self.attach_lookaheads(lr0_kernels)
 
-        # Update transitions
-        new_transitions = {}
-        for (state_index, symbol), target_index in self.transitions.items():
-            merged_source = state_mapping[state_index]
-            merged_target = state_mapping[target_index]
-            new_transitions[(merged_source, symbol)] = merged_target
-        self.transitions = new_transitions
+    def attach_lookaheads(self, lr0_kernels):
+        items = self.items
+        lookaheads = self.build_lookaheads(lr0_kernels)
+        width = self.item_width
+        self.kernels = [
+            tuple(lr0 * width + t for lr0 in kernel for t in bits(lookaheads[i][lr0]))
+            for i, kernel in enumerate(lr0_kernels)
+        ]
+        self.count_states()
+        self.stats['closure_hits'] = items.hits
+        self.stats['closure_misses'] = items.misses
 
-        # Rebuild action and goto tables based on merged states
-        self.action = {}
-        self.goto = {}
-        for i, state in enumerate(self.states):
-            for (left, production, dot, lookahead) in state:
-                if dot < len(production):
-                    symbol = production[dot]
-                    if is_terminal(symbol):
-                        s = self.transitions.get((i, symbol))
-                        if s is not None:
-                            key = (i, symbol)
-                            # Handle shift conflicts
-                            if key in self.action and self.action[key] != ('s', s):
-                                raise ValueError(f'Conflict at state {i}, symbol {symbol}')
-                            self.action[key] = ('s', s)
-                    else:
-                        s = self.transitions.get((i, symbol))
-                        if s is not None:
-                            self.goto[(i, symbol)] = s
-                else:
-                    if left == "S'":
-                        self.action[(i, '$')] = ('acc', None)
-                    else:
-                        key = (i, lookahead)
-                        # Handle reduce conflicts
-                        if key in self.action and self.action[key] != ('r', (left, production)):
-                            raise ValueError(f'Conflict at state {i}, symbol {lookahead}')
-                        self.action[key] = ('r', (left, production))
+    def build_lookaheads(self, kernels):
+        # Spontaneous generation and propagation of lookaheads (as bitmasks) over kernel items,
+        # using the closure templates in place of closures under a placeholder lookahead
+        items = self.items
+        n = len(items.nonterminals)
+        item_next, symbols = items.item_next, items.symbols
+        lookaheads = [dict.fromkeys(kernel, 0) for kernel in kernels]
+        lookaheads[0][items.prod_start[0]] = 1 << items.terminal_index['$']
+        propagates = {}
+        for i, kernel in enumerate(kernels):
+            for item in kernel:
+                code = item_next[item]
+                if code == END:
+                    continue
+                targets = [(self.transitions[(i, symbols[code])], item + 1)]
+                if code < n:
+                    mask, nullable = items.suffix_first[item + 1]
+                    for lr0, spontaneous, propagated in items.template(code):
+                        next_code = item_next[lr0]
+                        if next_code == END:
+                            continue
+                        j, target = self.transitions[(i, symbols[next_code])], lr0 + 1
+                        lookaheads[j][target] |= spontaneous | mask if propagated else spontaneous
+                        if propagated and nullable:
+                            targets.append((j, target))
+                propagates[(i, item)] = targets
 
-    def build_states(self):
-        logging.info('=========== Building states... ===========')
-        start_item = ("S'", self.cfg["S'"][0], 0, '$')
-        start_closure = self.build_closure({start_item})
-        self.states = [start_closure]
-        logging.info(f'State 0: {start_closure}')
-        states_added = True
-        while states_added:
-            states_added = False
-            for i, state in enumerate(self.states):
-                symbols = set()
-                for (left, production, dot, lookahead) in state:
-                    if dot < len(production):
-                        symbols.add(production[dot])
-                for symbol in symbols:
-                    goto_state = self.build_goto(state, symbol)
-                    # Check if this goto_state is already in self.states
-                    if goto_state in self.states:
-                        s = self.states.index(goto_state)
-                    else:
-                        s = len(self.states)
-                        self.states.append(goto_state)
-                        states_added = True
-                    self.transitions[(i, symbol)] = s
+        queue = deque((i, item) for i, values in enumerate(lookaheads) for item, mask in values.items() if mask)
+        while queue:
+            i, item = queue.popleft()
+            mask = lookaheads[i][item]
+            for j, target in propagates.get((i, item), ()):
+                old = lookaheads[j][target]
+                if old | mask != old:
+                    lookaheads[j][target] = old | mask
+                    queue.append((j, target))
+        return lookaheads
+
+    def build_action_goto(self, states=None):
+        items = self.items
+        for i in range(len(self.kernels)) if states is None else states:
+            for lr0, mask in self.completed_items(i):
+                production = items.productions[items.item_prod[lr0]]
+                if production[0] == "S'":
+                    self.add_reduce(i, '$', production)
+                    continue
+                for lookahead in bits(mask):
+                    self.add_reduce(i, items.terminals[lookahead], production)
+        self.build_shift_goto(states)
 
-    def parse(self, string):
-        return super().parse(string)
\ No newline at end of file
+    def parse(self, string, lexer=None):
+        return super().parse(string, lexer)
\ No newline at end of file
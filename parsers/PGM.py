@@ -0,0 +1,153 @@
+from collections import deque
+from .CLR import CLRParser
+from .items import END, bits
+
+
+def weakly_compatible(a, b, pairs):
+    # Pager's weak compatibility of two lookahead vectors over the same core: merging them
+    # cannot create a reduce/reduce conflict that neither state had on its own. Only the
+    # (i, j) positions in `pairs` are checked, the ones whose lookaheads can meet at all.
+    for i, j in pairs:
+        if (a[i] & b[j]) | (b[i] & a[j]) and not a[i] & a[j] and not b[i] & b[j]:
+            return False
+    return True
+
+
+class PGMParser(CLRParser):
+    # Minimal LR(1) by Pager's practical general method: canonical LR(1) states with the same
+    # core are merged during construction whenever they are weakly compatible. The test only
+    # looks at pairs of kernel items whose lookaheads can reach completed items after the same
+    # gotos, since other pairs cannot end up in a reduce/reduce conflict. States are only split
+    # where merging could introduce a conflict, so the result accepts exactly what CLR accepts;
+    # automata are at most CLR-sized and usually LALR-sized.
+    def build_states(self):
+        self.build_items()
+        items = self.items
+        width = self.item_width
+        symbols = items.symbols
+        cores, lookaheads, successors = self.build_pager()
+
+        # Drop states that re-expansion left unreachable and renumber breadth-first
+        order = [0]
+        number = {0: 0}
+        for i in order:
+            for code in sorted(successors[i]):
+                j = successors[i][code]
+                if j not in number:
+                    number[j] = len(order)
+                    order.append(j)
+        self.kernels = [
+            tuple(lr0 * width + t for lr0, mask in zip(cores[i], lookaheads[i]) for t in bits(mask))
+            for i in order
+        ]
+        self.state_index = {kernel: i for i, kernel in enumerate(self.kernels)}
+        self.transitions = {
+            (number[i], symbols[code]): number[j]
+            for i in order for code, j in sorted(successors[i].items())
+        }
+        self.count_states()
+        self.stats['closure_hits'] = items.hits
+        self.stats['closure_misses'] = items.misses
+
+    def rebuild_states(self, edit):
+        # Which states get merged depends on the order they are met in, so an edit builds the
+        # automaton again; the other phases of edit_grammar stay incremental
+        self.build_states()
+
+    def lookahead_carriers(self, kernel):
+        # The LR(0) items that receive the lookaheads of the `kernel` items in the same state:
+        # the items themselves plus the closure items they propagate to
+        items = self.items
+        n = len(items.nonterminals)
+        result = set(kernel)
+        for lr0 in kernel:
+            code = items.item_next[lr0]
+            if 0 <= code < n and items.suffix_first[lr0 + 1][1]:
+                result.update(item for item, _, propagates in items.template(code) if propagates)
+        return frozenset(result)
+
+    def may_collide(self, first, second):
+        # Whether some sequence of gotos takes the lookaheads of kernel items `first` and
+        # `second` to completed items of the same state, which a merge needs to cause a
+        # reduce/reduce conflict. Searches pairs of lookahead-carrying item sets.
+        items = self.items
+        item_next = items.item_next
+        start = (self.lookahead_carriers((first,)), self.lookahead_carriers((second,)))
+        seen = {start}
+        queue = [start]
+        while queue:
+            a, b = queue.pop()
+            if any(item_next[lr0] == END for lr0 in a) and any(item_next[lr0] == END for lr0 in b):
+                return True
+            codes = {item_next[lr0] for lr0 in a} & {item_next[lr0] for lr0 in b}
+            codes.discard(END)
+            for code in codes:
+                pair = (self.lookahead_carriers(tuple(lr0 + 1 for lr0 in a if item_next[lr0] == code)),
+                        self.lookahead_carriers(tuple(lr0 + 1 for lr0 in b if item_next[lr0] == code)))
+                if pair not in seen:
+                    seen.add(pair)
+                    queue.append(pair)
+        return False
+
+    def colliding_pairs(self, core, cache):
+        # Positions (i, j) of the kernel items of `core` that weak compatibility has to check
+        pairs = cache.get(core)
+        if pairs is None:
+            pairs = cache[core] = [(i, j) for i in range(len(core)) for j in range(i + 1, len(core))
+                                   if self.may_collide(core[i], core[j])]
+        return pairs
+
+    def build_pager(self):
+        # States are (core, lookahead masks aligned with the core). When a state's lookaheads
+        # grow it is expanded again, and its successors absorb the new lookaheads the same way.
+        items = self.items
+        cores = [(items.prod_start[0],)]
+        lookaheads = [[1 << items.terminal_index['$']]]
+        successors = [{}]
+        by_core = {cores[0]: [0]}
+        pairs = {}
+        queue = deque([0])
+        queued = {0}
+        emit = self.profiler.emit if self.profiler is not None and self.profiler.callback is not None else None
+        if emit is not None:
+            emit('state', 0, cores[0])
+        while queue:
+            i = queue.popleft()
+            queued.discard(i)
+            groups = items.goto_masks(zip(cores[i], lookaheads[i]))
+            previous = successors[i]
+            successors[i] = {}
+            for code in sorted(groups):
+                group = groups[code]
+                core = tuple(lr0 for lr0, _ in group)
+                masks = [mask for _, mask in group]
+                candidates = by_core.setdefault(core, [])
+                # Prefer the state this transition led to before, then the oldest compatible one
+                old = previous.get(code)
+                if old is not None:
+                    candidates = [old] + [j for j in candidates if j != old]
+                target = None
+                checked = self.colliding_pairs(core, pairs) if candidates else ()
+                for j in candidates:
+                    if weakly_compatible(lookaheads[j], masks, checked):
+                        target = j
+                        break
+                if target is None:
+                    target = len(cores)
+                    cores.append(core)
+                    lookaheads.append(masks)
+                    successors.append({})
+                    by_core[core].append(target)
+                    queue.append(target)
+                    queued.add(target)
+                    if emit is not None:
+                        emit('state', target, core)
+                else:
+                    merged = [a | b for a, b in zip(lookaheads[target], masks)]
+                    if merged != lookaheads[target]:
+                        lookaheads[target] = merged
+                        if target not in queued:
+                            queue.append(target)
+                            queued.add(target)
+                successors[i][code] = target
+        return cores, lookaheads, successors
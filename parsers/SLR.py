@@ -1,163 +1,516 @@
 import logging
-from .symbols import is_terminal, is_non_terminal
+import time
+from .symbols import is_terminal
+from .tables import ParseTable
+from .first_follow import GrammarSets
+from .items import ItemSpace, StateView, END
+from .push import PushParser
+from .tree import SyntaxTree
+from .glr import GLRParser
+from .precedence import Precedence
+from .optimize import optimize_table, MAX_GROWTH
+from .batch import parse_many
+from .parallel import GotoPool
+from .rebuild import GrammarEdit
+
+EVENT_COUNTERS = {'shift': 'shifts', 'reduce': 'reductions', 'accept': 'accepts', 'error': 'errors'}
+
+def format_action(action):
+    op, value = action
+    if op == 's':
+        return f'shift {value}'
+    if op == 'r':
+        return f'reduce {value[0]} -> {" ".join(value[1])}'
+    return {'acc': 'accept', 'e': 'error'}[op]
+
 
 class SLRParser:
-    def __init__(self, cfg):
+    item_width = 1
+    goto_method = 'goto0'
+    # Raise on conflicts that precedence does not resolve instead of applying yacc's defaults
+    strict = False
+
+    def __init__(self, cfg, precedence=None, profiler=None, build_workers=1, build_batch_size=64, strict=None):
         self.cfg = cfg
+        if strict is not None:
+            self.strict = strict
+        self.precedence = Precedence.of(precedence)
+        self.profiler = profiler
+        self.build_workers = build_workers
+        self.build_batch_size = build_batch_size
+        self.conflicts = []
+        self.sets = None
         self.first = {}
         self.follow = {}
-        self.states = []
+        self.items = None
+        self.production_index = {}
+        self.kernels = []
+        self.states = StateView(self)
         self.transitions = {}
         self.action = {}
         self.goto = {}
-        self.build_first()
-        self.build_follow()
-        self.build_states()
-        self.build_action_goto()
+        self.table = None
+        self.state_index = {}
+        self.stats = {}
+        self.run_phase('first', self.build_first)
+        self.run_phase('follow', self.build_follow)
+        self.run_phase('states', self.build_states)
+        self.run_phase('tables', self.build_action_goto, self.check_conflicts, self.build_table)
+        logging.info('Built %d states in %.3fs', len(self.kernels), self.stats['states_time'])
+
+    def run_phase(self, name, *steps):
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.emit('phase', name)
+        start = time.perf_counter()
+        for step in steps:
+            step()
+        elapsed = self.stats[f'{name}_time'] = time.perf_counter() - start
+        if profiler is not None:
+            profiler.time(name, elapsed)
+            profiler.emit('phase_end', name, elapsed)
+
+    @classmethod
+    def from_table(cls, cfg, table, precedence=None):
+        # Wrap an already built table, e.g. one loaded from a TableCache, without
+        # running any of the construction phases
+        parser = cls.__new__(cls)
+        parser.cfg = cfg
+        parser.precedence = Precedence.of(precedence)
+        parser.profiler = None
+        parser.build_workers = 1
+        parser.build_batch_size = 64
+        parser.conflicts = []
+        parser.sets = None
+        parser.first = {}
+        parser.follow = {}
+        parser.items = None
+        parser.production_index = {}
+        parser.kernels = []
+        parser.states = StateView(parser)
+        parser.transitions = {}
+        parser.action = None
+        parser.goto = None
+        parser.table = table
+        parser.state_index = {}
+        parser.stats = {}
+        return parser
+
+    # The dict tables are only used during construction; afterwards they are decoded
+    # from the compact table on first access
+    @property
+    def action(self):
+        if self._action is None:
+            self._action = self.table.action_dict()
+        return self._action
+
+    @action.setter
+    def action(self, value):
+        self._action = value
+
+    @property
+    def goto(self):
+        if self._goto is None:
+            self._goto = self.table.goto_dict()
+        return self._goto
+
+    @goto.setter
+    def goto(self, value):
+        self._goto = value
 
     def build_first(self):
-        self.first = {symbol: set() for symbol in self.cfg}
-        for symbol in self.cfg:
-            self.build_first_for_symbol(symbol)
-
-    def build_first_for_symbol(self, symbol):
-        for production in self.cfg[symbol]:
-            for sym in production:
-                if is_terminal(sym):
-                    self.first[symbol].add(sym)
-                    break
-                elif sym != symbol:  # Avoid immediate left recursion
-                    self.build_first_for_symbol(sym)
-                    self.first[symbol].update(self.first[sym] - {'ε'})
-                    if 'ε' not in self.first[sym]:
-                        break
-                else:
-                    break
+        self.sets = GrammarSets(self.cfg)
+        self.sets.build_first()
+        self.first = self.sets.first_dict()
 
     def build_follow(self):
-        self.follow = {symbol: set() for symbol in self.cfg}
-        self.follow["S'"] = {'$'}
-        changed = True
-        while changed:
-            changed = False
-            for left in self.cfg:
-                for production in self.cfg[left]:
-                    follow_temp = self.follow[left]
-                    for i in range(len(production)-1, -1, -1):
-                        sym = production[i]
-                        if is_non_terminal(sym):
-                            if self.follow[sym] != self.follow[sym] | follow_temp:
-                                self.follow[sym] |= follow_temp
-                                changed = True
-                            if 'ε' in self.first[sym]:
-                                follow_temp = follow_temp | (self.first[sym] - {'ε'})
-                            else:
-                                follow_temp = self.first[sym]
-                        else:
-                            follow_temp = {sym}
-
-    def build_closure(self, items):
-        closure = set(items)
-        while True:
-            new_items = set()
-            for (left, production, dot) in closure:
-                if dot < len(production):
-                    symbol = production[dot]
-                    if is_non_terminal(symbol):
-                        for prod in self.cfg[symbol]:
-                            new_item = (symbol, prod, 0)
-                            if new_item not in closure:
-                                new_items.add(new_item)
-            if not new_items:
-                break
-            closure.update(new_items)
-        return closure
+        self.sets.build_follow()
+        self.follow = self.sets.follow_dict()
+
+    def build_items(self):
+        # Also numbers the productions, which decides reduce/reduce conflicts (add_reduce);
+        # rebuild_states calls this too, so an edit renumbers them
+        self.items = ItemSpace(self.cfg, self.sets)
+        self.production_index = {production: p for p, production in enumerate(self.items.productions)}
 
-    def build_goto(self, state, symbol):
-        goto = set()
-        for (left, production, dot) in state:
-            if dot < len(production) and production[dot] == symbol:
-                goto.add((left, production, dot + 1))
-        return self.build_closure(goto)
+    def start_kernel(self):
+        return (self.items.prod_start[0],)
+
+    def closure(self, kernel):
+        return self.items.closure0(kernel)
+
+    def state_items(self, i):
+        return self.closure(self.kernels[i])
+
+    def completed_items(self, i):
+        # Closure items are never completed unless the grammar has empty productions
+        items = self.items
+        source = self.state_items(i) if items.has_empty else self.kernels[i]
+        return [item for item in source if items.item_next[item] == END]
+
+    def build_automaton(self, start_kernel, method):
+        # States are stored as sorted kernel tuples and identified by them: two kernels are
+        # equal iff their closures are. Closures are only materialized while a state is expanded.
+        # States are expanded in id order (breadth-first), `method` being the ItemSpace goto.
+        # With build_workers > 1 the gotos of the next run of unexpanded states are computed in
+        # a process pool; results are merged in id order, so numbering is the same as serial.
+        symbols = self.items.symbols
+        kernels = [start_kernel]
+        state_index = {start_kernel: 0}
+        transitions = {}
+        emit = self.profiler.emit if self.profiler is not None and self.profiler.callback is not None else None
+        if emit is not None:
+            emit('state', 0, start_kernel)
+        goto = getattr(self.items, method)
+        pool = GotoPool(self.cfg, method, self.build_workers, self.build_batch_size) if self.build_workers > 1 else None
+        i = 0
+        try:
+            while i < len(kernels):
+                if pool is None:
+                    expanded = (goto(kernels[i]),)
+                else:
+                    expanded = pool.expand(kernels[i:i + pool.span()])
+                for groups in expanded:
+                    for code in sorted(groups):
+                        kernel = groups[code]
+                        s = state_index.get(kernel)
+                        if s is None:
+                            s = len(kernels)
+                            state_index[kernel] = s
+                            kernels.append(kernel)
+                            if emit is not None:
+                                emit('state', s, kernel)
+                        transitions[(i, symbols[code])] = s
+                    i += 1
+        finally:
+            if pool is not None:
+                pool.close()
+        return kernels, state_index, transitions
 
     def build_states(self):
-        logging.debug('=========== Building states... ===========')
-        start_item = ("S'", self.cfg["S'"][0], 0)
-        start_closure = self.build_closure({start_item})
-        self.states.append(start_closure)
-        logging.debug(f'State 0: {start_closure}')
-        states_added = True
-        while states_added:
-            states_added = False
-            for i, state in enumerate(self.states):
-                logging.debug(f'Processing state {i}...')
-                symbols = set()
-                for (left, production, dot) in state:
-                    logging.debug(f'Item: {left} -> {" ".join(production[:dot])}.{" ".join(production[dot:])}')
-                    if dot < len(production):
-                        logging.debug(f'Next symbol: {production[dot]}')
-                        symbols.add(production[dot])
-                logging.debug(f'Symbols: {symbols}')
-                for symbol in symbols:
-                    logging.debug(f'Processing symbol {symbol}...')
-                    goto_state = self.build_goto(state, symbol)
-                    logging.debug(f'Goto state: {goto_state}')
-                    if goto_state and goto_state not in self.states:
-                        logging.debug(f'Adding state {len(self.states)}: {goto_state}')
-                        self.states.append(goto_state)
-                        states_added = True
-                    self.transitions[(i, symbol)] = self.states.index(goto_state)
-
-    def build_action_goto(self):
-        for i, state in enumerate(self.states):
-            for (left, production, dot) in state:
-                if dot < len(production):
-                    symbol = production[dot]
-                    if is_terminal(symbol):
-                        s = self.transitions.get((i, symbol))
-                        if s is not None:
-                            self.action[(i, symbol)] = ('s', s)
-                    else:
-                        s = self.transitions.get((i, symbol))
-                        if s is not None:
-                            self.goto[(i, symbol)] = s
+        self.build_items()
+        self.kernels, self.state_index, self.transitions = self.build_automaton(self.start_kernel(), self.goto_method)
+        self.count_states()
+
+    def rebuild_states(self, edit):
+        # States phase of edit_grammar: only the states the edit can reach are expanded again
+        self.build_items()
+        self.kernels, self.state_index, self.transitions = edit.update_automaton(
+            edit.old['kernels'], edit.old['transitions'], self.goto_method)
+        self.count_states()
+
+    def edit_grammar(self, add=(), remove=()):
+        # Removes and then adds (left, production) pairs and updates the parser in place,
+        # recomputing only what the edit can reach (see rebuild.GrammarEdit). If the update fails,
+        # e.g. on a conflict in a strict parser, the parser is left as it was.
+        if self.items is None:
+            raise ValueError('A parser wrapping a prebuilt table cannot be edited')
+        edit = GrammarEdit(self, add, remove)
+        try:
+            edit.run()
+        except Exception:
+            edit.restore()
+            raise
+        return self
+
+    def add_production(self, left, production):
+        return self.edit_grammar(add=[(left, production)])
+
+    def remove_production(self, left, production):
+        return self.edit_grammar(remove=[(left, production)])
+
+    def count_states(self):
+        self.stats['states'] = len(self.kernels)
+        self.stats['closure_calls'] = self.items.calls
+        if self.profiler is not None:
+            self.profiler.count('states', len(self.kernels))
+            self.profiler.count('kernel_items', sum(map(len, self.kernels)))
+            self.profiler.count('transitions', len(self.transitions))
+            self.profiler.count('closure_calls', self.items.calls)
+
+    # Conflicts are resolved as yacc does. Reductions are entered first, and among them the
+    # production listed first in the grammar wins. A shift then competes with the remaining
+    # reduction: precedence decides when both sides have one (nonassoc leaves an explicit
+    # error), otherwise the shift wins. Every conflict is recorded in self.conflicts.
+    def add_reduce(self, i, terminal, production):
+        key = (i, terminal)
+        action = ('acc', None) if production[0] == "S'" else ('r', production)
+        old = self.action.get(key)
+        if old is None or old == action:
+            self.action[key] = action
+            return
+        keep = min(old, action, key=self.production_order)
+        self.action[key] = keep
+        self.add_conflict(i, terminal, 'reduce/reduce', [old, action], keep, 'default')
+
+    def production_order(self, action):
+        if action[0] == 'acc':
+            return 0
+        return self.production_index[action[1]]
+
+    def add_shift(self, i, terminal, s):
+        key = (i, terminal)
+        shift = ('s', s)
+        old = self.action.get(key)
+        if old is None:
+            self.action[key] = shift
+            return
+        production = self.items.productions[0] if old[0] == 'acc' else old[1]
+        resolution = self.precedence.resolve(production, terminal) if self.precedence is not None else None
+        if resolution is None:
+            self.action[key] = shift
+            self.add_conflict(i, terminal, 'shift/reduce', [shift, old], shift, 'default')
+            return
+        chosen = {'shift': shift, 'reduce': old, 'error': ('e', None)}[resolution]
+        self.action[key] = chosen
+        self.add_conflict(i, terminal, 'shift/reduce', [shift, old], chosen, 'precedence')
+
+    def add_conflict(self, i, terminal, kind, actions, chosen, resolution):
+        self.conflicts.append({
+            'state': i,
+            'symbol': terminal,
+            'kind': kind,
+            'actions': actions,
+            'chosen': chosen,
+            'resolution': resolution,
+        })
+
+    def unresolved_conflicts(self):
+        return [c for c in self.conflicts if c['resolution'] == 'default']
+
+    def check_conflicts(self):
+        unresolved = self.unresolved_conflicts()
+        self.stats['conflicts'] = len(unresolved)
+        self.stats['resolved_conflicts'] = len(self.conflicts) - len(unresolved)
+        if unresolved:
+            if self.strict:
+                raise ValueError(f'Conflict at state {unresolved[0]["state"]}, symbol {unresolved[0]["symbol"]}')
+            logging.warning('%d unresolved conflicts', len(unresolved))
+
+    def conflict_report(self):
+        lines = []
+        for c in self.conflicts:
+            actions = ', '.join(format_action(action) for action in c['actions'])
+            lines.append(f'state {c["state"]}, symbol {c["symbol"]}: {c["kind"]} between {actions}; '
+                         f'chose {format_action(c["chosen"])} by {c["resolution"]}')
+        unresolved = len(self.unresolved_conflicts())
+        lines.append(f'{len(self.conflicts)} conflicts, {len(self.conflicts) - unresolved} resolved by precedence')
+        return '\n'.join(lines)
+
+    def build_shift_goto(self, states=None):
+        transitions = self.transitions.items()
+        if states is not None:
+            states = set(states)
+            transitions = [(key, s) for key, s in transitions if key[0] in states]
+        for (i, symbol), s in transitions:
+            if is_terminal(symbol):
+                self.add_shift(i, symbol, s)
+            else:
+                self.goto[(i, symbol)] = s
+
+    def build_action_goto(self, states=None):
+        # ACTION/GOTO entries of `states`, all states by default
+        items = self.items
+        for i in range(len(self.kernels)) if states is None else states:
+            for item in self.completed_items(i):
+                left, production = items.productions[items.item_prod[item]]
+                if left == "S'":
+                    self.add_reduce(i, '$', (left, production))
                 else:
-                    if left == "S'":
-                        self.action[(i, '$')] = ('acc', None)
-                    else:
-                        for terminal in self.follow[left]:
-                            self.action[(i, terminal)] = ('r', (left, production))
+                    for terminal in self.follow[left]:
+                        self.add_reduce(i, terminal, (left, production))
+        self.build_shift_goto(states)
 
-    def parse(self, string):
+    def build_table(self, rows=None, layout=None):
+        # `rows`: finished rows of the states without dict entries, `layout`: where to place
+        # them (see ParseTable.from_parser)
+        self.table = ParseTable.from_parser(self, rows, layout)
+        reused = rows.values() if rows is not None else ()
+        action_entries = len(self._action) + sum(len(action) for action, _ in reused)
+        goto_entries = len(self._goto) + sum(len(goto) for _, goto in reused)
+        self.stats['action_entries'] = action_entries
+        self.stats['goto_entries'] = goto_entries
+        self.stats['table_bytes'] = self.table.nbytes
+        if self.profiler is not None:
+            self.profiler.count('action_entries', action_entries)
+            self.profiler.count('goto_entries', goto_entries)
+        self.action = None
+        self.goto = None
+        # Construction is over: only kernels are kept, closures are regenerated on demand
+        self.items.closures.clear()
+
+    def optimized(self, actions=(), max_growth=MAX_GROWTH):
+        # A parser over the optimized table (see optimize_table). Unit productions that have a
+        # semantic action in `actions` keep their reductions; the others disappear from
+        # translate() results and syntax trees, which is what yacc's $$ = $1 default gives anyway.
+        # The bypass is kept if the table grows by at most `max_growth` of its size (None: any).
+        production_index = {production: p for p, production in enumerate(self.table.productions)}
+        keep = {production_index[production] for production in actions}
+        table, stats = optimize_table(self.table, keep, max_growth)
+        parser = type(self).from_table(self.cfg, table, self.precedence)
+        parser.stats = dict(self.stats, optimize=stats)
+        return parser
+
+    def parse(self, string, lexer=None):
+        if lexer is not None:
+            return self.parse_ids(lexer.tokenize(string, self.table))
+        return self.parse_ids(self.table.encode(string))
+
+    def parse_many(self, inputs, workers=1, chunksize=256, ordered=True, lexer=None):
+        # See batch.parse_many: results in input order, or (index, result) pairs when unordered
+        return parse_many(self.table, inputs, workers, chunksize, ordered, lexer)
+
+    def parse_ids(self, tokens):
+        if self.profiler is not None:
+            return self.parse_profiled(tokens)
+        table = self.table
+        base, check, value, default = table.action_base, table.action_check, table.action_value, table.default
+        goto_base, goto_check, goto_value = table.goto_base, table.goto_check, table.goto_value
+        prod_lhs, prod_len = table.prod_lhs, table.prod_len
+        tokens = iter(tokens)
         stack = [0]
-        input_string = list(string) + ['$']
-        index = 0
+        state = 0
+        symbol = next(tokens, 0)
         while True:
-            state = stack[-1]
-            symbol = input_string[index]
-            action = self.action.get((state, symbol))
-            if action is None:
-                logging.error(f'Error: No action for state {state}, symbol {symbol}')
+            i = base[state] + symbol
+            code = value[i] if check[i] == symbol else default[state]
+            if code > 0:
+                state = code - 1
+                stack.append(state)
+                symbol = next(tokens, 0)
+            elif code < 0:
+                production = -code - 1
+                if production == 0:
+                    logging.info('Accepted')
+                    return True
+                n = prod_len[production]
+                if n:
+                    del stack[-n:]
+                left = prod_lhs[production]
+                i = goto_base[stack[-1]] + left
+                if goto_check[i] != left:
+                    logging.error(f'Error: No goto for state {stack[-1]}, symbol {table.nonterminals[left]}')
+                    return None
+                state = goto_value[i]
+                stack.append(state)
+            else:
+                name = table.terminals[symbol] if symbol < len(table.terminals) else '<unknown>'
+                logging.error(f'Error: No action for state {state}, symbol {name}')
                 return None
-            op, val = action
-            if op == 's':
-                stack.append(val)
-                index += 1
-                logging.debug(f'Shift to {val}')
-            elif op == 'r':
-                left, production = val
-                for _ in production:
-                    stack.pop()
-                state = stack[-1]
-                goto_state = self.goto.get((state, left))
-                if goto_state is None:
-                    logging.error(f'Error: No goto for state {state}, symbol {left}')
+
+    def token_pairs(self, string, lexer=None):
+        # (terminal id, token) pairs; with a lexer the token is the matched text
+        table = self.table
+        unknown = len(table.terminals)
+        get = table.terminal_index.get
+        if lexer is None:
+            return ((get(token, unknown), token) for token in string)
+        return ((get(terminal, unknown), string[start:end]) for terminal, start, end in lexer.scan(string))
+
+    def parse_values(self, pairs, shift, reduce):
+        # LR driver that keeps a value next to every stack state, as yacc does:
+        # shift(symbol, token, position) gives the value of a token and
+        # reduce(production, values, position) the value of a nonterminal from those of its
+        # right-hand side. Returns the value of the start symbol, or None on a syntax error.
+        table = self.table
+        base, check, value, default = table.action_base, table.action_check, table.action_value, table.default
+        goto_base, goto_check, goto_value = table.goto_base, table.goto_check, table.goto_value
+        prod_lhs, prod_len = table.prod_lhs, table.prod_len
+        pairs = iter(pairs)
+        stack = [0]
+        values = [None]
+        state = 0
+        position = 0
+        symbol, token = next(pairs, (0, '$'))
+        while True:
+            i = base[state] + symbol
+            code = value[i] if check[i] == symbol else default[state]
+            if code > 0:
+                state = code - 1
+                stack.append(state)
+                values.append(shift(symbol, token, position))
+                position += 1
+                symbol, token = next(pairs, (0, '$'))
+            elif code < 0:
+                production = -code - 1
+                if production == 0:
+                    logging.info('Accepted')
+                    return values[-1]
+                n = prod_len[production]
+                if n:
+                    args = values[-n:]
+                    del stack[-n:]
+                    del values[-n:]
+                else:
+                    args = []
+                left = prod_lhs[production]
+                i = goto_base[stack[-1]] + left
+                if goto_check[i] != left:
+                    logging.error(f'Error: No goto for state {stack[-1]}, symbol {table.nonterminals[left]}')
                     return None
-                stack.append(goto_state)
-                logging.debug(f'Reduce by {left} -> {" ".join(production)}')
-            elif op == 'acc':
-                logging.info('Accepted')
-                return True
+                state = goto_value[i]
+                stack.append(state)
+                values.append(reduce(production, args, position))
+            else:
+                name = table.terminals[symbol] if symbol < len(table.terminals) else '<unknown>'
+                logging.error(f'Error: No action for state {state}, symbol {name} at token {position}')
+                return None
+
+    def translate(self, string, actions, lexer=None):
+        # Syntax-directed translation. `actions` maps (left, production) to a callable that
+        # receives the values of the right-hand side symbols; tokens are their own values
+        # (the matched text with a lexer). Productions without an action pass on the value of
+        # their first symbol, like yacc's $$ = $1.
+        productions = self.table.productions
+        table = [actions.get(production) for production in productions]
+
+        def reduce(production, values, position):
+            action = table[production]
+            if action is not None:
+                return action(*values)
+            return values[0] if values else None
+
+        return self.parse_values(self.token_pairs(string, lexer), lambda symbol, token, position: token, reduce)
+
+    def parse_tree(self, string, lexer=None):
+        # Concrete syntax tree as a SyntaxTree, or None on a syntax error
+        tree = SyntaxTree(self.table)
+        root = self.parse_values(self.token_pairs(string, lexer), tree.shift, tree.reduce)
+        if root is None:
+            return None
+        tree.root = root
+        return tree
+
+    def parse_forest(self, string, lexer=None):
+        # All parses as a ParseForest, forking at conflicts left to the default resolution;
+        # None on a syntax error
+        return GLRParser(self).parse(string, lexer)
+
+    def parse_profiled(self, tokens):
+        # Same automaton driven through PushParser so every shift and reduction can be
+        # counted and reported; parse_ids stays free of per-step checks
+        profiler = self.profiler
+        terminals = self.table.terminals
+        push = PushParser(self)
+        start = time.perf_counter()
+        for symbol in tokens:
+            events = push.feed_id(symbol, terminals[symbol] if symbol < len(terminals) else '<unknown>')
+            self.profile_events(events)
+            if push.done:
+                break
+        if not push.done:
+            self.profile_events(push.finish())
+        profiler.time('parse', time.perf_counter() - start)
+        if push.accepted:
+            logging.info('Accepted')
+            return True
+        return None
+
+    def profile_events(self, events):
+        profiler = self.profiler
+        for event in events:
+            profiler.count(EVENT_COUNTERS[event[0]])
+            profiler.emit(*event)
 
     def print_tables(self):
         logging.info('First:')
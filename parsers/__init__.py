@@ -1,4 +1,17 @@
 from .SLR import SLRParser
 from .symbols import is_terminal, is_non_terminal
 from .CLR import CLRParser
-from .LALR import LALRParser
\ No newline at end of file
+from .LALR import LALRParser
+from .PGM import PGMParser
+from .tables import ParseTable
+from .cache import TableCache
+from .codegen import generate_module, write_module
+from .push import PushParser
+from .lexer import Lexer
+from .instrument import Profiler
+from .tree import SyntaxTree
+from .glr import GLRParser, ParseForest
+from .generate import SentenceGenerator
+from .incremental import IncrementalParser
+from .precedence import Precedence
+from .optimize import optimize_table
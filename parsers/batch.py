@@ -0,0 +1,176 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+
+# Table and lexer of a pool worker, installed once by init_worker instead of being sent with
+# every task
+worker_table = None
+worker_lexer = None
+
+
+def parse_all(table, inputs, lexer=None):
+    # Yields True or None for every input. The table arrays are bound once for the whole batch;
+    # failures are not logged, since batches are expected to contain many invalid inputs.
+    base, check, value, default = table.action_base, table.action_check, table.action_value, table.default
+    goto_base, goto_check, goto_value = table.goto_base, table.goto_check, table.goto_value
+    prod_lhs, prod_len = table.prod_lhs, table.prod_len
+    unknown = len(table.terminals)
+    get = table.terminal_index.get
+    for tokens in inputs:
+        if lexer is not None:
+            tokens = lexer.tokenize(tokens, table)
+        else:
+            tokens = (get(token, unknown) for token in tokens)
+        stack = [0]
+        state = 0
+        symbol = next(tokens, 0)
+        while True:
+            i = base[state] + symbol
+            code = value[i] if check[i] == symbol else default[state]
+            if code > 0:
+                state = code - 1
+                stack.append(state)
+                symbol = next(tokens, 0)
+            elif code < 0:
+                production = -code - 1
+                if production == 0:
+                    result = True
+                    break
+                n = prod_len[production]
+                if n:
+                    del stack[-n:]
+                left = prod_lhs[production]
+                i = goto_base[stack[-1]] + left
+                if goto_check[i] != left:
+                    result = None
+                    break
+                state = goto_value[i]
+                stack.append(state)
+            else:
+                result = None
+                break
+        yield result
+
+
+def check_all(table, inputs, lexer, trace=False):
+    # Like parse_all, but every result is (accepted, error, steps). `error` is (offset, token
+    # index, state, terminal) of the token the parse stopped at: offset is where it starts in
+    # the input, terminal is None for text no rule matches and '$' at the end. `steps` lists
+    # the actions taken when `trace` is set and is None otherwise.
+    base, check, value, default = table.action_base, table.action_check, table.action_value, table.default
+    goto_base, goto_check, goto_value = table.goto_base, table.goto_check, table.goto_value
+    prod_lhs, prod_len = table.prod_lhs, table.prod_len
+    unknown = len(table.terminals)
+    # Lexer rule -> terminal id and name; the rule after "unmatched" stands for the end
+    ids = [table.terminal_index.get(t, unknown) for t in lexer.terminals] + [unknown, 0]
+    names = lexer.terminals + [None, '$']
+    end_rule = len(ids) - 1
+    reductions = [f"reduce {left} -> {' '.join(production)}" for left, production in table.productions]
+    for data in inputs:
+        spans = lexer.scan_rules(data)
+        eof = (end_rule, len(data), len(data))
+        steps = [] if trace else None
+        stack = [0]
+        state = 0
+        index = 0
+        rule, start, _ = next(spans, eof)
+        symbol = ids[rule]
+        while True:
+            i = base[state] + symbol
+            code = value[i] if check[i] == symbol else default[state]
+            if code > 0:
+                state = code - 1
+                stack.append(state)
+                if trace:
+                    steps.append(f'shift {state}')
+                index += 1
+                rule, start, _ = next(spans, eof)
+                symbol = ids[rule]
+            elif code < 0:
+                production = -code - 1
+                if production == 0:
+                    if trace:
+                        steps.append('accept')
+                    result = (True, None, steps)
+                    break
+                n = prod_len[production]
+                if n:
+                    del stack[-n:]
+                left = prod_lhs[production]
+                i = goto_base[stack[-1]] + left
+                if goto_check[i] != left:
+                    result = (None, (start, index, stack[-1], names[rule]), steps)
+                    break
+                state = goto_value[i]
+                stack.append(state)
+                if trace:
+                    steps.append(reductions[production])
+            else:
+                result = (None, (start, index, state, names[rule]), steps)
+                break
+        yield result
+
+
+def init_worker(table, lexer):
+    global worker_table, worker_lexer
+    worker_table = table
+    worker_lexer = lexer
+
+
+def parse_chunk(chunk, details=False, trace=False):
+    if details:
+        return list(check_all(worker_table, chunk, worker_lexer, trace))
+    return list(parse_all(worker_table, chunk, worker_lexer))
+
+
+def chunks(inputs, size):
+    inputs = iter(inputs)
+    while True:
+        chunk = list(islice(inputs, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_many(table, inputs, workers=1, chunksize=256, ordered=True, lexer=None, details=False, trace=False):
+    # Ordered: yields one result per input, in input order. Unordered: yields
+    # (input index, result) pairs as chunks finish. At most a few chunks per worker are in
+    # flight, so `inputs` may be an arbitrarily long iterator. With `details` (a lexer is then
+    # required) the results are check_all's (accepted, error, steps).
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        results = check_all(table, inputs, lexer, trace) if details else parse_all(table, inputs, lexer)
+        if ordered:
+            yield from results
+        else:
+            yield from enumerate(results)
+        return
+
+    window = workers * 4
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(table, lexer)) as pool:
+        pending = deque() if ordered else set()
+        offset = 0
+        for chunk in chunks(inputs, chunksize):
+            future = pool.submit(parse_chunk, chunk, details, trace)
+            if ordered:
+                pending.append(future)
+                while len(pending) >= window:
+                    yield from pending.popleft().result()
+            else:
+                future.offset = offset
+                pending.add(future)
+                while len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for finished in done:
+                        yield from enumerate(finished.result(), finished.offset)
+            offset += len(chunk)
+        if ordered:
+            while pending:
+                yield from pending.popleft().result()
+        else:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for finished in done:
+                    yield from enumerate(finished.result(), finished.offset)
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import tempfile
+from .tables import ParseTable, FORMAT_VERSION
+from .precedence import Precedence
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'compilers-parsers')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# mkstemp creates files readable by their owner only; cached tables get the permissions an
+# ordinary file would, so a cache directory can be shared. The umask can only be read by
+# setting it, so that is done once, at import.
+UMASK = os.umask(0o022)
+os.umask(UMASK)
+FILE_MODE = 0o644 & ~UMASK
+
+
+def fingerprint(cfg, parser_class, precedence=None):
+    # Stable across processes and runs: depends only on the grammar text, the precedence
+    # declarations, the parser kind and the table format, never on hash seeds or object identities
+    key = [FORMAT_VERSION, parser_class.__name__, [[left, [list(p) for p in productions]] for left, productions in cfg.items()]]
+    precedence = Precedence.of(precedence)
+    if precedence is not None:
+        key.append(precedence.as_json())
+    payload = json.dumps(key, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class TableCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or os.environ.get('PARSER_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.lrtb')
+
+    def get(self, cfg, parser_class, precedence=None):
+        path = self.path(fingerprint(cfg, parser_class, precedence))
+        try:
+            with open(path, 'rb') as f:
+                # Read-only shared mapping: every process that loads this grammar shares the pages
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+        try:
+            table = ParseTable.loads(buffer)
+        except ValueError as e:
+            logging.warning(f'Ignoring cached table {path}: {e}')
+            return None
+        try:
+            os.utime(path)  # Mark as recently used for eviction
+        except OSError:
+            pass
+        return table
+
+    def put(self, cfg, parser_class, table, precedence=None):
+        path = self.path(fingerprint(cfg, parser_class, precedence))
+        data = table.dumps()
+        # Write to a temporary file in the same directory and rename it over the target, so
+        # concurrent readers see either the old file or the complete new one
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.tmp-', suffix='.lrtb')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp, FILE_MODE)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        self.evict(keep=path)
+
+    def load(self, cfg, parser_class, precedence=None):
+        table = self.get(cfg, parser_class, precedence)
+        if table is not None:
+            return parser_class.from_table(cfg, table, precedence)
+        parser = parser_class(cfg, precedence=precedence)
+        self.put(cfg, parser_class, parser.table, precedence)
+        return parser
+
+    def evict(self, keep=None):
+        # Drop least recently used tables until the directory fits in max_bytes
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.lrtb') or name.startswith('.tmp-'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.lrtb'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
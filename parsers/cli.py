@@ -0,0 +1,134 @@
+import argparse
+import json
+import logging
+import mmap
+import sys
+import time
+from .SLR import SLRParser
+from .CLR import CLRParser
+from .LALR import LALRParser
+from .PGM import PGMParser
+from .batch import parse_many
+from .cache import TableCache
+from .grammar import parse_cfg, parse_precedence
+from .lexer import Lexer
+
+KINDS = {'SLR': SLRParser, 'CLR': CLRParser, 'LALR': LALRParser, 'PGM': PGMParser}
+# Output is written in blocks of this many result lines
+WRITE_BATCH = 4096
+
+
+def read_lines(paths, use_mmap=False):
+    # Input lines without their line ending, as bytes. Standard input ('-' or no paths) is
+    # streamed; with `use_mmap` files are mapped and every line is a zero-copy memoryview slice.
+    for path in paths or ['-']:
+        if path == '-':
+            for line in sys.stdin.buffer:
+                yield line.rstrip(b'\r\n')
+        elif use_mmap:
+            with open(path, 'rb') as f:
+                try:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except ValueError:  # empty file
+                    continue
+            view = memoryview(data)
+            find = data.find
+            pos, size = 0, len(data)
+            while pos < size:
+                end = find(b'\n', pos)
+                if end < 0:
+                    end = size
+                stop = end - 1 if end > pos and data[end - 1] == 13 else end
+                yield view[pos:stop]
+                pos = end + 1
+        else:
+            with open(path, 'rb', buffering=1 << 20) as f:
+                for line in f:
+                    yield line.rstrip(b'\r\n')
+
+
+def format_result(index, result):
+    accepted, error, steps = result
+    if accepted and steps is None:
+        return f'{{"index": {index}, "accepted": true}}\n'
+    record = {'index': index, 'accepted': bool(accepted)}
+    if error is not None:
+        offset, token, state, symbol = error
+        record['error'] = {'offset': offset, 'token': token, 'state': state, 'symbol': symbol}
+    if steps is not None:
+        record['steps'] = steps
+    return json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def load_parser(path, kind, cache_dir=None, use_cache=True):
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    cfg, precedence = parse_cfg(text), parse_precedence(text)
+    if "S'" not in cfg:
+        raise ValueError(f"{path}: the grammar has no S' -> ... start production")
+    parser_class = KINDS[kind]
+    if not use_cache:
+        return parser_class(cfg, precedence=precedence)
+    return TableCache(cache_dir).load(cfg, parser_class, precedence)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m parsers',
+        description='Parse inputs line by line and write one JSON result per line',
+    )
+    parser.add_argument('grammar', help='Grammar file in the `A -> x y | z` format of the UI')
+    parser.add_argument('inputs', nargs='*', help="Input files, one input per line (default: stdin, also '-')")
+    parser.add_argument('--kind', default='LALR', choices=list(KINDS))
+    parser.add_argument('--output', help='Write JSONL here instead of stdout')
+    parser.add_argument('--trace', action='store_true', help='Include the shift/reduce steps of every input')
+    parser.add_argument('--workers', type=int, default=1, help='Parsing processes (0: one per CPU)')
+    parser.add_argument('--chunksize', type=int, default=1024, help='Inputs sent to a worker at a time')
+    parser.add_argument('--mmap', action='store_true', help='Map input files instead of reading them')
+    parser.add_argument('--cache-dir', help='Table cache directory (default: $PARSER_CACHE_DIR or ~/.cache)')
+    parser.add_argument('--no-cache', action='store_true', help='Always build the tables')
+    parser.add_argument('--summary', action='store_true', help='Print counts and throughput on stderr')
+    args = parser.parse_intermixed_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+    try:
+        lr = load_parser(args.grammar, args.kind, args.cache_dir, not args.no_cache)
+    except (OSError, ValueError) as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 2
+    table = lr.table
+    lexer = Lexer.from_terminals(table.terminals)
+
+    lines = read_lines(args.inputs, args.mmap)
+    workers = args.workers or None
+    if workers != 1:
+        # Memoryviews do not pickle; workers get copies of the lines
+        lines = (bytes(line) if isinstance(line, memoryview) else line for line in lines)
+    results = parse_many(table, lines, workers, args.chunksize, lexer=lexer, details=True, trace=args.trace)
+
+    out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    start = time.perf_counter()
+    count = accepted = 0
+    pending = []
+    try:
+        for count, result in enumerate(results, 1):
+            if result[0]:
+                accepted += 1
+            pending.append(format_result(count - 1, result))
+            if len(pending) >= WRITE_BATCH:
+                out.write(''.join(pending).encode('utf-8'))
+                pending = []
+        out.write(''.join(pending).encode('utf-8'))
+        out.flush()
+    except BrokenPipeError:
+        # e.g. piped into `head`; nothing left to report to
+        return 0
+    finally:
+        if args.output:
+            out.close()
+    if args.summary:
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed if elapsed else 0
+        print(f'{count} inputs, {accepted} accepted, {count - accepted} rejected, '
+              f'{elapsed:.3f}s ({rate:.0f} inputs/s)', file=sys.stderr)
+    return 0 if accepted == count else 1
@@ -0,0 +1,160 @@
+from collections import defaultdict
+
+# Generated modules only use the standard library, keep the packed tables as tuple constants
+# (unmarshalled straight from the .pyc) and expose parse(tokens) -> True | None.
+
+HEADER = '''\
+# Generated from a {kind} table by parsers.codegen ({mode} mode). Do not edit.
+
+TERMINALS = {terminals!r}
+NONTERMINALS = {nonterminals!r}
+PRODUCTIONS = {productions!r}
+PROD_LHS = {prod_lhs!r}
+PROD_LEN = {prod_len!r}
+TERMINAL_INDEX = {{t: i for i, t in enumerate(TERMINALS)}}
+'''
+
+TABLE_TEMPLATE = '''
+ACTION_BASE = {action_base!r}
+ACTION_CHECK = {action_check!r}
+ACTION_VALUE = {action_value!r}
+DEFAULT = {default!r}
+GOTO_BASE = {goto_base!r}
+GOTO_CHECK = {goto_check!r}
+GOTO_VALUE = {goto_value!r}
+
+
+def parse(tokens):
+    unknown = len(TERMINALS)
+    index = TERMINAL_INDEX.get
+    tokens = iter(tokens)
+    stack = [0]
+    state = 0
+    symbol = index(next(tokens, '$'), unknown)
+    while True:
+        i = ACTION_BASE[state] + symbol
+        code = ACTION_VALUE[i] if ACTION_CHECK[i] == symbol else DEFAULT[state]
+        if code > 0:
+            state = code - 1
+            stack.append(state)
+            symbol = index(next(tokens, '$'), unknown)
+        elif code < 0:
+            production = -code - 1
+            if production == 0:
+                return True
+            n = PROD_LEN[production]
+            if n:
+                del stack[-n:]
+            left = PROD_LHS[production]
+            i = GOTO_BASE[stack[-1]] + left
+            if GOTO_CHECK[i] != left:
+                return None
+            state = GOTO_VALUE[i]
+            stack.append(state)
+        else:
+            return None
+'''
+
+DIRECT_TEMPLATE = '''
+
+def parse(tokens):
+    unknown = len(TERMINALS)
+    index = TERMINAL_INDEX.get
+    tokens = iter(tokens)
+    stack = [0]
+    state = 0
+    symbol = index(next(tokens, '$'), unknown)
+    while True:
+        code = ACTIONS[state](symbol)
+        if code > 0:
+            state = code - 1
+            stack.append(state)
+            symbol = index(next(tokens, '$'), unknown)
+        elif code < 0:
+            production = -code - 1
+            if production == 0:
+                return True
+            n = PROD_LEN[production]
+            if n:
+                del stack[-n:]
+            state = GOTOS[stack[-1]](PROD_LHS[production])
+            if state < 0:
+                return None
+            stack.append(state)
+        else:
+            return None
+'''
+
+
+def tuple_of(values):
+    return tuple(int(v) for v in values)
+
+
+def emit_branches(name, row, default):
+    # One function per state: explicit entries grouped by target, then the default
+    lines = [f'def {name}(t):']
+    groups = defaultdict(list)
+    for column, code in sorted(row.items()):
+        groups[code].append(column)
+    for code, columns in groups.items():
+        if len(columns) == 1:
+            lines.append(f'    if t == {columns[0]}:')
+        else:
+            lines.append(f'    if t in {tuple(columns)!r}:')
+        lines.append(f'        return {code}')
+    lines.append(f'    return {default}')
+    return '\n'.join(lines)
+
+
+def generate_module(parser, mode='table'):
+    table = parser.table
+    source = HEADER.format(
+        kind=type(parser).__name__,
+        mode=mode,
+        terminals=tuple(table.terminals),
+        nonterminals=tuple(table.nonterminals),
+        productions=tuple((left, tuple(production)) for left, production in table.productions),
+        prod_lhs=tuple_of(table.prod_lhs),
+        prod_len=tuple_of(table.prod_len),
+    )
+    if mode == 'table':
+        return source + TABLE_TEMPLATE.format(
+            action_base=tuple_of(table.action_base),
+            action_check=tuple_of(table.action_check),
+            action_value=tuple_of(table.action_value),
+            default=tuple_of(table.default),
+            goto_base=tuple_of(table.goto_base),
+            goto_check=tuple_of(table.goto_check),
+            goto_value=tuple_of(table.goto_value),
+        )
+    if mode != 'direct':
+        raise ValueError(f'Unknown code generation mode: {mode}')
+
+    functions = []
+    for state in range(table.n_states):
+        actions = {}
+        gotos = {}
+        for t in range(len(table.terminals)):
+            i = table.action_base[state] + t
+            if table.action_check[i] == t:
+                actions[t] = table.action_value[i]
+        for n in range(len(table.nonterminals)):
+            target = table.lookup_goto(state, n)
+            if target is not None:
+                gotos[n] = target
+        functions.append(emit_branches(f'_action_{state}', actions, table.default[state]))
+        functions.append(emit_branches(f'_goto_{state}', gotos, -1))
+    states = range(table.n_states)
+    return (
+        source + '\n\n' + '\n\n\n'.join(functions) + '\n\n\n'
+        + f'ACTIONS = ({", ".join(f"_action_{s}" for s in states)},)\n'
+        + f'GOTOS = ({", ".join(f"_goto_{s}" for s in states)},)\n'
+        + DIRECT_TEMPLATE
+    )
+
+
+def write_module(parser, path, mode='table'):
+    source = generate_module(parser, mode)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(source)
+    return path
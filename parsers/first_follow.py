@@ -0,0 +1,251 @@
+from .symbols import is_non_terminal
+
+EPSILON = 'ε'
+
+
+def digraph(n, edges, base):
+    # DeRemer & Pennello's digraph traversal: F(x) = base[x] | F(y) for every y with x -> y.
+    # Members of a strongly connected component have the same F, so each component is solved
+    # once, in an order where everything it depends on is already finished. Iterative to avoid
+    # recursion limits on long chains.
+    result = list(base)
+    depth = [0] * n
+    position = [0] * n
+    stack = []
+    done = n + 1
+    for root in range(n):
+        if depth[root]:
+            continue
+        stack.append(root)
+        depth[root] = position[root] = len(stack)
+        work = [(root, iter(edges[root]))]
+        while work:
+            x, targets = work[-1]
+            for y in targets:
+                if not depth[y]:
+                    stack.append(y)
+                    depth[y] = position[y] = len(stack)
+                    work.append((y, iter(edges[y])))
+                    break
+                if depth[y] < depth[x]:
+                    depth[x] = depth[y]
+                result[x] |= result[y]
+            else:
+                work.pop()
+                if depth[x] == position[x]:
+                    while True:
+                        top = stack.pop()
+                        depth[top] = done
+                        result[top] = result[x]
+                        if top == x:
+                            break
+                if work:
+                    parent = work[-1][0]
+                    if depth[x] < depth[parent]:
+                        depth[parent] = depth[x]
+                    result[parent] |= result[x]
+    return result
+
+
+def reach(edges, start):
+    seen = set(start)
+    queue = list(seen)
+    while queue:
+        x = queue.pop()
+        for y in edges[x]:
+            if y not in seen:
+                seen.add(y)
+                queue.append(y)
+    return seen
+
+
+class GrammarSets:
+    # Nullable/FIRST/FOLLOW with terminal sets as integer bitmasks over interned terminals
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.nonterminals = list(cfg)
+        self.nonterminal_index = {symbol: i for i, symbol in enumerate(self.nonterminals)}
+        terminals = {sym for productions in cfg.values() for production in productions for sym in production
+                     if not is_non_terminal(sym)}
+        self.terminals = ['$'] + sorted(terminals - {'$', EPSILON})
+        self.terminal_index = {symbol: i for i, symbol in enumerate(self.terminals)}
+        self.nullable = [False] * len(self.nonterminals)
+        self.first = [0] * len(self.nonterminals)
+        self.follow = [0] * len(self.nonterminals)
+
+    def encode(self, production):
+        # Nonterminals as their index, terminals as ~index, ε dropped
+        encoded = []
+        for sym in production:
+            if sym == EPSILON:
+                continue
+            if is_non_terminal(sym):
+                if sym not in self.nonterminal_index:
+                    raise KeyError(sym)
+                encoded.append(self.nonterminal_index[sym])
+            else:
+                encoded.append(~self.terminal_index[sym])
+        return encoded
+
+    def build_nullable(self, only):
+        # Linear worklist: a production becomes nullable once all its symbols are. Only the
+        # nonterminals in `only` are recomputed; the others keep their current values.
+        nullable = self.nullable
+        for a in only:
+            nullable[a] = False
+        remaining = []
+        uses = [[] for _ in self.nonterminals]
+        queue = []
+        for a in only:
+            for production in self.cfg[self.nonterminals[a]]:
+                encoded = self.encode(production)
+                if any(sym < 0 or sym not in only and not nullable[sym] for sym in encoded):
+                    continue
+                pending = [sym for sym in encoded if sym in only]
+                remaining.append([a, len(pending)])
+                for sym in pending:
+                    uses[sym].append(len(remaining) - 1)
+                if not pending and not nullable[a]:
+                    nullable[a] = True
+                    queue.append(a)
+        while queue:
+            symbol = queue.pop()
+            for p in uses[symbol]:
+                remaining[p][1] -= 1
+                a = remaining[p][0]
+                if remaining[p][1] == 0 and not nullable[a]:
+                    nullable[a] = True
+                    queue.append(a)
+
+    def build_first(self, only=None):
+        # With `only`, a set of nonterminal ids, FIRST sets outside it are taken as final
+        n = len(self.nonterminals)
+        if only is None:
+            only = range(n)
+        self.build_nullable(only)
+        base = [0 if a in only else self.first[a] for a in range(n)]
+        edges = [[] for _ in range(n)]
+        for a in only:
+            for production in self.cfg[self.nonterminals[a]]:
+                for sym in self.encode(production):
+                    if sym < 0:
+                        base[a] |= 1 << ~sym
+                        break
+                    if sym in only:
+                        edges[a].append(sym)
+                    else:
+                        base[a] |= self.first[sym]
+                    if not self.nullable[sym]:
+                        break
+        self.first = digraph(n, edges, base)
+
+    def build_follow(self, start="S'", only=None):
+        # With `only`, FOLLOW sets outside it are taken as final and only the productions
+        # mentioning a member of `only` are scanned (self.users must be set, see update_first)
+        n = len(self.nonterminals)
+        if only is None:
+            only = lefts = range(n)
+        else:
+            lefts = {a for sym in only for a in self.users[sym]}
+        base = [0 if a in only else self.follow[a] for a in range(n)]
+        edges = [[] for _ in range(n)]
+        if start in self.nonterminal_index and self.nonterminal_index[start] in only:
+            base[self.nonterminal_index[start]] = 1 << self.terminal_index['$']
+        for a in lefts:
+            for production in self.cfg[self.nonterminals[a]]:
+                encoded = self.encode(production)
+                # Walk right to left, carrying FIRST of the suffix and whether it is nullable
+                suffix, nullable = 0, True
+                for sym in reversed(encoded):
+                    if sym < 0:
+                        suffix, nullable = 1 << ~sym, False
+                        continue
+                    if sym in only:
+                        base[sym] |= suffix
+                        if nullable:
+                            if a in only:
+                                edges[sym].append(a)
+                            else:
+                                base[sym] |= self.follow[a]
+                    if self.nullable[sym]:
+                        suffix |= self.first[sym]
+                    else:
+                        suffix, nullable = self.first[sym], False
+        self.follow = digraph(n, edges, base)
+
+    # Incremental update after the productions of some nonterminals were edited. Both take the
+    # sets of the grammar before the edit; symbols must be interned as they were there, apart
+    # from new nonterminals at the end (see can_update). Returns the ids whose sets changed.
+    def can_update(self, old):
+        return self.terminals == old.terminals and self.nonterminals[:len(old.nonterminals)] == old.nonterminals
+
+    def dependencies(self):
+        # users[b]: nonterminals with a production mentioning b; mentions[a]: the reverse
+        n = len(self.nonterminals)
+        users = [set() for _ in range(n)]
+        mentions = [set() for _ in range(n)]
+        for left, productions in self.cfg.items():
+            a = self.nonterminal_index[left]
+            for production in productions:
+                for sym in self.encode(production):
+                    if sym >= 0:
+                        users[sym].add(a)
+                        mentions[a].add(sym)
+        return users, mentions
+
+    def update_first(self, old, edited):
+        # Nullability and FIRST can only change for nonterminals that reach an edited one
+        extra = len(self.nonterminals) - len(old.nonterminals)
+        self.nullable = old.nullable + [False] * extra
+        self.first = old.first + [0] * extra
+        self.users, self.mentions = self.dependencies()
+        only = reach(self.users, {self.nonterminal_index[left] for left in edited})
+        self.build_first(only)
+        return {a for a in only if a >= len(old.nonterminals)
+                or (self.nullable[a], self.first[a]) != (old.nullable[a], old.first[a])}
+
+    def update_follow(self, old, edited, changed):
+        # FOLLOW changes for the symbols of edited productions (old and new) and of productions
+        # where a symbol with a changed FIRST set occurs, and for everything their FOLLOW flows into
+        extra = len(self.nonterminals) - len(old.nonterminals)
+        self.follow = old.follow + [0] * extra
+        seeds = set(range(len(old.nonterminals), len(self.nonterminals)))
+        for left in edited:
+            a = self.nonterminal_index[left]
+            seeds.add(a)
+            seeds |= self.mentions[a]
+            for production in old.cfg.get(left, ()):
+                seeds.update(sym for sym in self.encode(production) if sym >= 0)
+        for sym in changed:
+            for a in self.users[sym]:
+                seeds |= self.mentions[a]
+        only = reach(self.mentions, seeds)
+        self.build_follow(only=only)
+        return {a for a in only if a >= len(old.nonterminals) or self.follow[a] != old.follow[a]}
+
+    def first_of(self, sequence):
+        mask = 0
+        for sym in self.encode(sequence):
+            if sym < 0:
+                return mask | 1 << ~sym, False
+            mask |= self.first[sym]
+            if not self.nullable[sym]:
+                return mask, False
+        return mask, True
+
+    def names(self, mask):
+        names = set()
+        while mask:
+            low = mask & -mask
+            names.add(self.terminals[low.bit_length() - 1])
+            mask ^= low
+        return names
+
+    def first_dict(self):
+        return {
+            symbol: self.names(self.first[i]) | ({EPSILON} if self.nullable[i] else set())
+            for i, symbol in enumerate(self.nonterminals)
+        }
+
+    def follow_dict(self):
+        return {symbol: self.names(self.follow[i]) for i, symbol in enumerate(self.nonterminals)}
@@ -0,0 +1,234 @@
+import random
+from collections import Counter
+from itertools import product
+from .first_follow import EPSILON
+from .SLR import SLRParser
+from .glr import GLRParser
+
+INFINITY = float('inf')
+
+
+class SentenceGenerator:
+    # Sentences of a grammar in the cfg dict format, for load tests and for checking parsers
+    # against each other. Symbols are interned as in ItemSpace: nonterminal i is i, terminal t
+    # is ~t; 'ε' derives nothing. For every nonterminal the generator knows the shortest
+    # sentence it derives and the lowest derivation tree of that length (`size`), plus the
+    # production that achieves both (`finish`). Always expanding by `finish` is guaranteed to
+    # terminate, which is what lets random expansion aim at a length without overshooting it.
+    # Productions are kept as (left, codes, original tuple, codes reversed for the stack).
+    def __init__(self, cfg, seed=None, start="S'"):
+        self.cfg = cfg
+        self.random = random.Random(seed)
+        self.nonterminals = list(cfg)
+        index = {n: i for i, n in enumerate(self.nonterminals)}
+        terminals = sorted({s for ps in cfg.values() for p in ps for s in p if s not in cfg and s != EPSILON})
+        self.terminals = terminals
+        terminal_index = {t: i for i, t in enumerate(terminals)}
+        self.productions = []
+        self.by_left = [[] for _ in self.nonterminals]
+        for left, productions in cfg.items():
+            for production in productions:
+                codes = tuple(index[s] if s in cfg else ~terminal_index[s] for s in production if s != EPSILON)
+                self.by_left[index[left]].append(len(self.productions))
+                self.productions.append((index[left], codes, production, codes[::-1]))
+        self.start = index[start]
+        self.build_sizes()
+        if self.size[self.start][0] == INFINITY:
+            raise ValueError(f'{start} derives no finite sentence')
+        self.uses = Counter()
+        self.oracle = None
+
+    def build_sizes(self):
+        # (min length, height) per nonterminal by relaxation; unproductive ones stay infinite
+        n = len(self.nonterminals)
+        size = [(INFINITY, INFINITY)] * n
+        finish = [None] * n
+        changed = True
+        while changed:
+            changed = False
+            for p, (left, codes, _, _) in enumerate(self.productions):
+                length, height = 0, 0
+                for code in codes:
+                    if code < 0:
+                        length += 1
+                    else:
+                        length += size[code][0]
+                        height = max(height, size[code][1])
+                candidate = (length, height + 1)
+                if candidate < size[left]:
+                    size[left] = candidate
+                    finish[left] = p
+                    changed = True
+        self.size = size
+        self.finish = finish
+        self.min_length = [length for length, _ in size]
+        # Extra tokens each production needs beyond the shortest sentence of its left side
+        # (infinite for unproductive ones), and whether it can derive sentences of more than one
+        # length. Both decide which productions fit the tokens left and help reach the target.
+        self.extra = [sum(1 if c < 0 else self.min_length[c] for c in codes) - self.min_length[left]
+                      if self.min_length[left] < INFINITY else INFINITY
+                      for left, codes, _, _ in self.productions]
+        flexible = [False] * n
+        changed = True
+        while changed:
+            changed = False
+            for left in range(n):
+                if flexible[left]:
+                    continue
+                usable = [p for p in self.by_left[left] if self.extra[p] < INFINITY]
+                if len({self.extra[p] for p in usable}) > 1 or any(
+                        c >= 0 and flexible[c] for p in usable for c in self.productions[p][1]):
+                    flexible[left] = changed = True
+        # Positions in the reversed codes of the children that can grow
+        self.flexible_children = [[i for i, c in enumerate(reversed_codes) if c >= 0 and flexible[c]]
+                                  for _, _, _, reversed_codes in self.productions]
+        self.grows = [bool(places) for places in self.flexible_children]
+        self.max_extra = [max((self.extra[p] for p in ps if self.extra[p] < INFINITY), default=0) for ps in self.by_left]
+        self.candidates = {}
+
+    def choose(self, left, slack):
+        # A production of `left` that fits in `slack` extra tokens. While there is slack, only
+        # productions that can still grow are considered, or failing that the longest that fit.
+        # Productions never used yet come first, so every production shows up early; after
+        # that the choice is uniform.
+        key = (left, min(slack, self.max_extra[left] + 1))
+        candidates = self.candidates.get(key)
+        if candidates is None:
+            candidates = [p for p in self.by_left[left] if self.extra[p] <= slack]
+            if slack > 0:
+                most = max(self.extra[p] for p in candidates)
+                candidates = [p for p in candidates if self.grows[p]] or [p for p in candidates if self.extra[p] == most]
+            candidates = self.candidates[key] = tuple(candidates)
+        if len(self.uses) < len(self.productions):
+            fresh = [p for p in candidates if p not in self.uses]
+            if fresh:
+                candidates = fresh
+        return candidates[int(self.random.random() * len(candidates))]
+
+    def tokens(self, length=16):
+        # Lazily yields the terminals of one random sentence of at most `length` tokens, and
+        # close to it when the grammar allows (the shortest sentence if `length` is smaller).
+        # Every pending symbol carries a budget of tokens beyond its shortest sentence. An
+        # expansion spends part of it on the production, splits the rest at random among the
+        # children that can grow and passes what it cannot place on to the next symbol.
+        # Memory grows with the nesting of the derivation, not with its length.
+        productions, extra, finish, uses = self.productions, self.extra, self.finish, self.uses
+        flexible, terminals, rng = self.flexible_children, self.terminals, self.random
+        stack = [self.start]
+        budgets = [max(0, length - self.min_length[self.start])]
+        carry = 0
+        expansions = 0
+        limit = 8 * length + 64  # then only `finish`, in case of e.g. A -> A B with B nullable
+        while stack:
+            code = stack.pop()
+            budget = budgets.pop() + carry
+            carry = 0
+            if code < 0:
+                carry = budget
+                yield terminals[~code]
+                continue
+            expansions += 1
+            if expansions > limit:
+                p, budget = finish[code], 0
+            else:
+                p = self.choose(code, budget)
+            uses[p] += 1
+            children = productions[p][3]
+            stack.extend(children)
+            shares = [0] * len(children)
+            budget -= extra[p]
+            places = flexible[p]
+            if budget and places:
+                if len(places) == 1:
+                    shares[places[0]] = budget
+                else:
+                    cuts = sorted(rng.randint(0, budget) for _ in range(len(places) - 1))
+                    for place, low, high in zip(places, [0] + cuts, cuts + [budget]):
+                        shares[place] = high - low
+            else:
+                carry = budget
+            budgets.extend(shares)
+
+    def sentence(self, length=16):
+        return list(self.tokens(length))
+
+    def sentences(self, count=None, length=16):
+        # Endless (or `count`) random sentences; each is built only when it is asked for
+        i = 0
+        while count is None or i < count:
+            yield self.sentence(length)
+            i += 1
+
+    def exhaustive(self, depth, max_length=None):
+        # Every distinct sentence with a derivation tree at most `depth` levels high, optionally
+        # only those of at most `max_length` tokens, shortest first
+        memo = {}
+
+        def derive(code, depth):
+            if code < 0:
+                return [(self.terminals[~code],)]
+            if depth == 0:
+                return []
+            key = (code, depth)
+            if key not in memo:
+                result = set()
+                for p in self.by_left[code]:
+                    parts = [derive(c, depth - 1) for c in self.productions[p][1]]
+                    for combination in product(*parts):
+                        sentence = sum(combination, ())
+                        if max_length is None or len(sentence) <= max_length:
+                            result.add(sentence)
+                memo[key] = result
+            return memo[key]
+
+        for sentence in sorted(derive(self.start, depth), key=lambda s: (len(s), s)):
+            yield list(sentence)
+
+    def mutate(self, sentence):
+        # One random edit: delete, insert, replace or swap tokens. A grammar without terminals
+        # only derives the empty sentence, which is returned as it is.
+        sentence = list(sentence)
+        rng = self.random
+        operations = ['insert'] if self.terminals else []
+        if sentence:
+            operations += ['delete', 'replace']
+        if len(sentence) > 1:
+            operations.append('swap')
+        if not operations:
+            return sentence
+        operation = rng.choice(operations)
+        if operation == 'insert':
+            sentence.insert(rng.randint(0, len(sentence)), rng.choice(self.terminals))
+        elif operation == 'delete':
+            del sentence[rng.randrange(len(sentence))]
+        elif operation == 'replace':
+            sentence[rng.randrange(len(sentence))] = rng.choice(self.terminals)
+        else:
+            i = rng.randrange(len(sentence) - 1)
+            sentence[i], sentence[i + 1] = sentence[i + 1], sentence[i]
+        return sentence
+
+    def accepts(self, sentence):
+        # Reference recognizer: GLR over an SLR table, which accepts exactly the grammar's
+        # language whatever conflicts the table has
+        if self.oracle is None:
+            self.oracle = GLRParser(SLRParser(self.cfg), log_errors=False)
+        return self.oracle.parse(sentence) is not None
+
+    def near_misses(self, count=None, length=16, attempts=1000):
+        # Invalid sentences one edit away from a valid one. Stops early if `attempts` mutations
+        # in a row all stay in the language.
+        i = 0
+        failed = 0
+        while (count is None or i < count) and failed < attempts:
+            sentence = self.mutate(self.sentence(length))
+            if self.accepts(sentence):
+                failed += 1
+                continue
+            failed = 0
+            yield sentence
+            i += 1
+
+    def coverage(self):
+        # Share of the productions used by the random sentences so far
+        return len(self.uses) / len(self.productions)
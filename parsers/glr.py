@@ -0,0 +1,350 @@
+import logging
+from array import array
+from collections import deque
+from itertools import product
+
+
+class ParseForest:
+    # Shared packed parse forest stored column-wise like SyntaxTree. A symbol node stands for
+    # one symbol over one span and is shared by every derivation that needs it; its packed
+    # nodes are the alternative ways of deriving it.
+    #   label, start, end  nonterminal id (~terminal id for a token leaf) and span of node i
+    #   packed             first packed node of node i, -1 for leaves
+    #   production, first, count, next
+    #                      packed node j: production, its children at children[first:first + count]
+    #                      and the next packed node of the same symbol node (-1 ends the list)
+    # Symbol nodes are looked up by (label, start) among the nodes ending at the current
+    # position, which is what makes them shared.
+    def __init__(self, table):
+        self.table = table
+        self.label = array('i')
+        self.start = array('i')
+        self.end = array('i')
+        self.packed = array('i')
+        self.production = array('i')
+        self.first = array('i')
+        self.count = array('i')
+        self.next = array('i')
+        self.children = array('i')
+        self.root = -1
+        self.current = {}
+
+    def __len__(self):
+        return len(self.label)
+
+    @property
+    def nbytes(self):
+        return sum(len(column) * column.itemsize for column in
+                   (self.label, self.start, self.end, self.packed, self.production, self.first,
+                    self.count, self.next, self.children))
+
+    def add(self, label, start, end):
+        node = len(self.label)
+        self.label.append(label)
+        self.start.append(start)
+        self.end.append(end)
+        self.packed.append(-1)
+        return node
+
+    def leaf(self, symbol, position):
+        # Called once per position, before advance()
+        return self.add(~symbol, position, position + 1)
+
+    def advance(self):
+        self.current.clear()
+
+    def reduce(self, left, production, children, start, end):
+        key = (left, start)
+        node = self.current.get(key)
+        if node is None:
+            node = self.current[key] = self.add(left, start, end)
+        j = self.packed[node]
+        while j >= 0:
+            if self.production[j] == production and self.children[self.first[j]:self.first[j] + self.count[j]] == array('i', children):
+                return node
+            j = self.next[j]
+        self.production.append(production)
+        self.first.append(len(self.children))
+        self.count.append(len(children))
+        self.next.append(self.packed[node])
+        self.packed[node] = len(self.production) - 1
+        self.children.extend(children)
+        return node
+
+    def is_token(self, node):
+        return self.label[node] < 0
+
+    def symbol(self, node):
+        label = self.label[node]
+        if label < 0:
+            return self.table.terminals[~label]
+        return self.table.nonterminals[label]
+
+    def alternatives(self, node):
+        # (production id, children) of every way to derive `node`, oldest first
+        result = []
+        j = self.packed[node]
+        while j >= 0:
+            first = self.first[j]
+            result.append((self.production[j], tuple(self.children[first:first + self.count[j]])))
+            j = self.next[j]
+        result.reverse()
+        return result
+
+    def walk(self, node=None):
+        # Every node reachable from `node`, each once
+        node = self.root if node is None else node
+        seen = {node}
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            yield node
+            for _, children in self.alternatives(node):
+                for child in children:
+                    if child not in seen:
+                        seen.add(child)
+                        stack.append(child)
+
+    def is_ambiguous(self, node=None):
+        return any(len(self.alternatives(n)) > 1 for n in self.walk(node))
+
+    def count_trees(self, node=None):
+        # Number of distinct trees below `node`, or inf if a cyclic grammar makes it unbounded
+        node = self.root if node is None else node
+        counts = {}
+        active = set()
+        stack = [(node, False)]
+        while stack:
+            n, done = stack.pop()
+            if done:
+                active.discard(n)
+                total = 0
+                for _, children in self.alternatives(n):
+                    trees = 1
+                    for child in children:
+                        trees *= counts[child]
+                    total += trees
+                counts[n] = total
+            elif n not in counts:
+                if n in active:
+                    return float('inf')
+                if self.label[n] < 0:
+                    counts[n] = 1
+                    continue
+                active.add(n)
+                stack.append((n, True))
+                for _, children in self.alternatives(n):
+                    stack.extend((child, False) for child in children)
+        return counts[node]
+
+    def trees(self, node=None, path=frozenset()):
+        # Nested (symbol, children...) tuples of every tree, like SyntaxTree.to_tuple; meant for
+        # small forests and tests. Cycles are not unrolled.
+        node = self.root if node is None else node
+        if self.label[node] < 0:
+            yield self.symbol(node)
+            return
+        path = path | {node}
+        for _, children in self.alternatives(node):
+            if any(child in path for child in children):
+                continue
+            for subtrees in product(*(list(self.trees(child, path)) for child in children)):
+                yield (self.symbol(node),) + subtrees
+
+
+class StackNode:
+    # Graph-structured stack node: LR state, input position it was entered at and its edges
+    # (lower node, forest node of the symbol between them)
+    __slots__ = ('state', 'level', 'edges')
+
+    def __init__(self, state, level):
+        self.state = state
+        self.level = level
+        self.edges = []
+
+
+def paths(node, length, via):
+    # (bottom node, forest nodes left to right) of every path of `length` edges down from
+    # `node`; with `via`, only the paths that use that edge
+    result = []
+    stack = [(node, length, (), via is None)]
+    while stack:
+        node, left, labels, used = stack.pop()
+        if not left:
+            if used:
+                result.append((node, labels))
+            continue
+        for edge in node.edges:
+            stack.append((edge[0], left - 1, (edge[1],) + labels, used or edge is via))
+    return result
+
+
+class GLRParser:
+    # Generalized LR over a parser's table: cells where a conflict was left to the default
+    # resolution keep all their actions (ParseTable.alternatives), and the parse forks there.
+    # While no fork is live the driver is the plain LR loop over a list stack. At a fork the
+    # stack becomes a graph-structured stack whose tops share everything below them; it turns
+    # back into a list once a single top with a linear history is left. An edge added to an
+    # existing top re-runs the reductions of every top through that edge (Farshi's
+    # correction), which keeps empty productions and hidden left recursion complete. The
+    # result is a ParseForest, so ambiguous input costs polynomial rather than exponential space.
+    def __init__(self, parser, log_errors=True):
+        self.table = parser.table
+        self.log_errors = log_errors
+
+    def parse(self, string, lexer=None):
+        if lexer is not None:
+            return self.parse_ids(lexer.tokenize(string, self.table))
+        return self.parse_ids(self.table.encode(string))
+
+    def parse_ids(self, tokens):
+        table = self.table
+        base, check, value, default = table.action_base, table.action_check, table.action_value, table.default
+        goto_base, goto_check, goto_value = table.goto_base, table.goto_check, table.goto_value
+        prod_lhs, prod_len = table.prod_lhs, table.prod_len
+        width = len(table.terminals) + 1
+        forks = {state * width + t: codes for (state, t), codes in table.alternatives.items()}
+        forest = ParseForest(table)
+        reduce, current = forest.reduce, forest.current
+        tokens = iter(tokens)
+        symbol = next(tokens, 0)
+        position = 0
+        states, labels, levels = [0], [-1], [0]
+
+        def actions(state):
+            codes = forks.get(state * width + symbol)
+            if codes is not None:
+                return codes
+            i = base[state] + symbol
+            code = value[i] if check[i] == symbol else default[state]
+            return (code,) if code else ()
+
+        def goto(state, left):
+            i = goto_base[state] + left
+            return goto_value[i] if goto_check[i] == left else None
+
+        while True:
+            # Deterministic stretch: the plain LR loop, building the forest as it goes
+            while True:
+                state = states[-1]
+                if forks and state * width + symbol in forks:
+                    break
+                i = base[state] + symbol
+                code = value[i] if check[i] == symbol else default[state]
+                if code > 0:
+                    states.append(code - 1)
+                    labels.append(forest.leaf(symbol, position))
+                    position += 1
+                    levels.append(position)
+                    forest.advance()
+                    symbol = next(tokens, 0)
+                elif code < 0:
+                    production = -code - 1
+                    if production == 0:
+                        forest.root = labels[-1]
+                        return forest
+                    n = prod_len[production]
+                    children = labels[-n:] if n else ()
+                    if n:
+                        del states[-n:]
+                        del labels[-n:]
+                        del levels[-n:]
+                    left = prod_lhs[production]
+                    i = goto_base[states[-1]] + left
+                    if goto_check[i] != left:
+                        if self.log_errors:
+                            logging.error(f'Error: No goto for state {states[-1]}, symbol {table.nonterminals[left]}')
+                        return None
+                    size = len(current)
+                    labels.append(reduce(left, production, children, levels[-1], position))
+                    states.append(goto_value[i])
+                    levels.append(position)
+                    if len(current) == size:
+                        # The node was already built at this position: only a cyclic grammar
+                        # does that, and only the stack graph notices that the cycle is closed
+                        break
+                else:
+                    return self.fail(symbol, position, [state])
+
+            # Fork: continue on a graph-structured stack built from the list stack
+            top = None
+            for state, label, level in zip(states, labels, levels):
+                node = StackNode(state, level)
+                if top is not None:
+                    node.edges.append((top, label))
+                top = node
+            frontier = {top.state: top}
+            while True:
+                queue = deque()
+                shifts = []
+                root = None
+
+                def actor(node):
+                    nonlocal root
+                    for code in actions(node.state):
+                        if code > 0:
+                            shifts.append((node, code - 1))
+                        elif code == -1:
+                            root = node.edges[0][1]
+                        else:
+                            queue.append((node, -code - 1, None))
+
+                for node in list(frontier.values()):
+                    actor(node)
+                while queue:
+                    node, production, via = queue.popleft()
+                    left = prod_lhs[production]
+                    n = prod_len[production]
+                    for bottom, children in paths(node, n, via) if n else ((node, ()),):
+                        target = goto(bottom.state, left)
+                        if target is None:
+                            continue
+                        label = reduce(left, production, children, bottom.level, position)
+                        top = frontier.get(target)
+                        if top is None:
+                            top = frontier[target] = StackNode(target, position)
+                            top.edges.append((bottom, label))
+                            actor(top)
+                        elif all(edge[0] is not bottom for edge in top.edges):
+                            edge = (bottom, label)
+                            top.edges.append(edge)
+                            for other in list(frontier.values()):
+                                for code in actions(other.state):
+                                    if code < -1 and prod_len[-code - 1]:
+                                        queue.append((other, -code - 1, edge))
+                if root is not None:
+                    forest.root = root
+                    return forest
+                if not shifts:
+                    return self.fail(symbol, position, sorted(frontier))
+
+                leaf = forest.leaf(symbol, position)
+                position += 1
+                forest.advance()
+                frontier = {}
+                for node, target in shifts:
+                    top = frontier.get(target)
+                    if top is None:
+                        top = frontier[target] = StackNode(target, position)
+                    top.edges.append((node, leaf))
+                symbol = next(tokens, 0)
+
+                # Back to the list stack once a single top with one path below it is left
+                if len(frontier) == 1:
+                    chain = [next(iter(frontier.values()))]
+                    while len(chain[-1].edges) == 1:
+                        chain.append(chain[-1].edges[0][0])
+                    if not chain[-1].edges:
+                        chain.reverse()
+                        states = [node.state for node in chain]
+                        levels = [node.level for node in chain]
+                        labels = [-1] + [node.edges[0][1] for node in chain[1:]]
+                        break
+
+    def fail(self, symbol, position, states):
+        if not self.log_errors:
+            return None
+        table = self.table
+        name = table.terminals[symbol] if symbol < len(table.terminals) else '<unknown>'
+        logging.error(f'Error: No action for states {states}, symbol {name} at token {position}')
+        return None
@@ -0,0 +1,24 @@
+# Grammar text format shared by the UI and the command line: one nonterminal per line as
+# `A -> x y | z`, plus yacc-style precedence lines such as `%left + -`, lowest first
+
+
+def parse_cfg(grammar_text):
+    cfg = {}
+    for line in grammar_text.splitlines():
+        line = line.strip()
+        if not line or "->" not in line:
+            continue
+        head, productions = line.split("->", 1)
+        head = head.strip()
+        production_list = [tuple(prod.strip().split()) for prod in productions.split("|")]
+        cfg[head] = production_list
+    return cfg
+
+
+def parse_precedence(grammar_text):
+    declarations = []
+    for line in grammar_text.splitlines():
+        words = line.split()
+        if words and words[0] in ("%left", "%right", "%nonassoc"):
+            declarations.append((words[0][1:], *words[1:]))
+    return declarations or None
@@ -0,0 +1,171 @@
+from bisect import bisect_left
+from .lexer import Lexer
+
+
+class IncrementalParser:
+    # Keeps the token stream of a text together with copies of the parser stack taken every
+    # `interval` tokens. An edit is re-lexed only around the changed span and re-parsing
+    # resumes from the last checkpoint before it. The stack before token k depends only on the
+    # tokens before k, so once the new parse reaches an old checkpoint (past the edit) with an
+    # identical stack, the rest of the old parse would repeat exactly and parsing stops there.
+    #
+    # Tokens are stored as terminal ids and widths (distance to the next token's start), so an
+    # edit does not have to renumber the offsets of every token after it.
+    def __init__(self, parser, lexer=None, interval=64):
+        self.table = parser.table
+        self.lexer = lexer if lexer is not None else Lexer.from_terminals(self.table.terminals)
+        self.interval = interval
+        unknown = len(self.table.terminals)
+        self.rule_ids = [self.table.terminal_index.get(t, unknown) for t in self.lexer.terminals] + [unknown]
+        self.text = ''
+        self.ids = []
+        self.widths = []
+        self.lead = 0
+        self.checkpoints = []  # (token index, char offset, stack tuple), by token index
+        self.accepted = False
+        self.error = None  # (token index, char offset) of the offending token
+        self.reparsed = 0
+
+    def parse(self, text):
+        ids, starts = [], []
+        rule_ids = self.rule_ids
+        for rule, start, _ in self.lexer.scan_rules(text):
+            ids.append(rule_ids[rule])
+            starts.append(start)
+        self.text = text
+        self.ids = ids
+        self.lead = starts[0] if starts else len(text)
+        self.widths = [end - start for start, end in zip(starts, starts[1:] + [len(text)])]
+        self.checkpoints = []
+        return self.run(0, self.lead, (0,), [], len(ids), None)
+
+    def edit(self, offset, deleted, inserted):
+        old_text = self.text
+        if not 0 <= offset <= offset + deleted <= len(old_text):
+            raise ValueError(f'Edit ({offset}, {deleted}) out of range for text of length {len(old_text)}')
+        text = old_text[:offset] + inserted + old_text[offset + deleted:]
+        delta = len(inserted) - deleted
+        ids, widths, checkpoints = self.ids, self.widths, self.checkpoints
+        n = len(ids)
+
+        # a: the last token starting before the edit, backed off by one more token so that
+        # tokens which can grow into the edited text (e.g. `=` becoming `==`) are re-lexed
+        j = bisect_left([c[1] for c in checkpoints], offset) - 1
+        a, pos = 0, self.lead
+        if j >= 0 and n:
+            a, pos = checkpoints[j][0], checkpoints[j][1]
+            while a + 1 < n and pos + widths[a] < offset:
+                pos += widths[a]
+                a += 1
+            if a > 0:
+                a -= 1
+                pos -= widths[a]
+
+        # Re-lex from token a until a token starts, after the edit, exactly where an old token
+        # started; from there on the old tokens are still valid
+        rule_ids = self.rule_ids
+        edit_end = offset + len(inserted)
+        new_ids, new_starts = [], []
+        b, old_start = a, pos
+        synced = False
+        for rule, start, _ in self.lexer.scan_rules(text, pos if a > 0 else 0):
+            if start >= edit_end:
+                while b < n and old_start < start - delta:
+                    old_start += widths[b]
+                    b += 1
+                if b < n and old_start == start - delta:
+                    synced = True
+                    break
+            new_ids.append(rule_ids[rule])
+            new_starts.append(start)
+        if not synced:
+            b = n
+        end = old_start + delta if synced else len(text)
+        new_widths = [y - x for x, y in zip(new_starts, new_starts[1:] + [end])]
+        first = new_starts[0] if new_starts else end
+        if a > 0:
+            widths[a - 1] = first - (pos - widths[a - 1])
+        else:
+            self.lead = first
+        ids[a:b] = new_ids
+        widths[a:b] = new_widths
+        shift = len(new_ids) - (b - a)
+        self.text = text
+
+        # Checkpoints up to token a are untouched; those from token b on describe the old parse
+        # and become candidates for the early stop
+        keep = [c for c in checkpoints if c[0] <= a] if a > 0 else [(0, self.lead, (0,))]
+        tail = [(k + shift, o + delta, stack) for k, o, stack in checkpoints if k >= b]
+        outcome = None
+        if self.error is None:
+            outcome = (self.accepted, None)
+        elif self.error[0] >= b:
+            outcome = (False, (self.error[0] + shift, self.error[1] + delta))
+        self.checkpoints = keep
+        k, o, stack = keep[-1]
+        return self.run(k, o, stack, tail, a + len(new_ids), outcome)
+
+    def run(self, k, offset, stack, tail, resync, outcome):
+        table = self.table
+        base, check, value, default = table.action_base, table.action_check, table.action_value, table.default
+        goto_base, goto_check, goto_value = table.goto_base, table.goto_check, table.goto_value
+        prod_lhs, prod_len = table.prod_lhs, table.prod_len
+        ids, widths = self.ids, self.widths
+        n = len(ids)
+        interval = self.interval
+        checkpoints = self.checkpoints
+        old = {c[0]: i for i, c in enumerate(tail)}
+        if not checkpoints or checkpoints[-1][0] < k:
+            checkpoints.append((k, offset, tuple(stack)))
+        last = checkpoints[-1][0]
+        begin = k
+        stack = list(stack)
+        state = stack[-1]
+        symbol = ids[k] if k < n else 0
+        while True:
+            i = base[state] + symbol
+            code = value[i] if check[i] == symbol else default[state]
+            if code > 0:
+                state = code - 1
+                stack.append(state)
+                offset += widths[k]
+                k += 1
+                if k >= resync and k in old:
+                    previous = tail[old[k]]
+                    if previous[2] == tuple(stack) and outcome is not None:
+                        checkpoints.extend(tail[old[k]:])
+                        self.accepted, self.error = outcome
+                        self.reparsed = k - begin
+                        return True if self.accepted else None
+                if k - last >= interval:
+                    checkpoints.append((k, offset, tuple(stack)))
+                    last = k
+                symbol = ids[k] if k < n else 0
+            elif code < 0:
+                production = -code - 1
+                if production == 0:
+                    self.accepted, self.error = True, None
+                    self.reparsed = k - begin
+                    return True
+                count = prod_len[production]
+                if count:
+                    del stack[-count:]
+                left = prod_lhs[production]
+                i = goto_base[stack[-1]] + left
+                if goto_check[i] != left:
+                    break
+                state = goto_value[i]
+                stack.append(state)
+            else:
+                break
+        self.accepted, self.error = False, (k, offset)
+        self.reparsed = k - begin
+        return None
+
+    def tokens(self):
+        # (terminal, start, end) of the current token stream; `end` includes trailing skipped text
+        terminals = self.table.terminals
+        start = self.lead
+        for symbol, width in zip(self.ids, self.widths):
+            yield (terminals[symbol] if symbol < len(terminals) else None, start, start + width)
+            start += width
@@ -0,0 +1,49 @@
+from collections import Counter
+
+# Events passed to a Profiler callback:
+#   ('phase', name)                 a construction phase starts
+#   ('phase_end', name, seconds)
+#   ('state', i, kernel)            a new state was added to the automaton
+#   ('shift', token, state)         parse events, as produced by PushParser
+#   ('reduce', left, production)
+#   ('accept',)
+#   ('error', state, token)
+
+
+class Profiler:
+    # Parsers only touch a profiler when one is attached, so the build and parse loops pay
+    # nothing for instrumentation by default
+    def __init__(self, callback=None):
+        self.counters = Counter()
+        self.timers = Counter()
+        self.callback = callback
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def time(self, name, seconds):
+        self.timers[name] += seconds
+
+    def emit(self, *event):
+        if self.callback is not None:
+            self.callback(*event)
+
+    def reset(self):
+        self.counters.clear()
+        self.timers.clear()
+
+    def as_dict(self):
+        return {'counters': dict(self.counters), 'timers': dict(self.timers)}
+
+    def report(self):
+        lines = []
+        if self.timers:
+            total = sum(self.timers.values())
+            lines.append(f'{"phase":<20}{"seconds":>12}{"share":>8}')
+            for name, seconds in self.timers.items():
+                lines.append(f'{name:<20}{seconds:>12.6f}{seconds / total if total else 0:>8.1%}')
+        if self.counters:
+            lines.append(f'{"counter":<20}{"value":>12}')
+            for name, value in self.counters.items():
+                lines.append(f'{name:<20}{value:>12}')
+        return '\n'.join(lines)
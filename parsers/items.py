@@ -0,0 +1,256 @@
+from collections import OrderedDict
+from .symbols import is_non_terminal
+
+# Item encoding. Productions are interned (production 0 is S' -> S) and their LR(0) items are
+# numbered contiguously, so an LR(0) item is prod_start[p] + dot and advancing the dot is +1.
+# An LR(1) item is lr0 * n_terminals + lookahead, so advancing the dot is +n_terminals.
+# Symbols are coded nonterminal i -> i and terminal t -> n_nonterminals + t; END marks a
+# completed item.
+END = -1
+
+
+def bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class ItemSpace:
+    closure_cache_size = 256
+
+    def __init__(self, cfg, sets):
+        self.cfg = cfg
+        self.sets = sets
+        self.nonterminals = sets.nonterminals
+        self.nonterminal_index = sets.nonterminal_index
+        # 'ε' is shifted like any terminal by the automaton, so it gets a lookahead id too
+        self.terminals = list(sets.terminals)
+        if any('ε' in production for productions in cfg.values() for production in productions):
+            self.terminals.append('ε')
+        self.terminal_index = {t: i for i, t in enumerate(self.terminals)}
+        self.n_terminals = len(self.terminals)
+        n = len(self.nonterminals)
+        self.symbols = self.nonterminals + self.terminals
+
+        self.productions = [("S'", cfg["S'"][0])]
+        self.productions += [(left, production) for left in cfg for production in cfg[left]
+                             if (left, production) != self.productions[0]]
+        self.has_empty = any(not production for _, production in self.productions)
+        self.prod_lhs = []
+        self.prod_start = []
+        self.nt_prods = [[] for _ in range(n)]
+        self.item_prod = []
+        self.item_dot = []
+        self.item_next = []
+        for p, (left, production) in enumerate(self.productions):
+            self.prod_lhs.append(self.nonterminal_index[left])
+            self.nt_prods[self.nonterminal_index[left]].append(p)
+            self.prod_start.append(len(self.item_prod))
+            for dot in range(len(production) + 1):
+                self.item_prod.append(p)
+                self.item_dot.append(dot)
+                if dot == len(production):
+                    self.item_next.append(END)
+                elif is_non_terminal(production[dot]):
+                    self.item_next.append(self.nonterminal_index[production[dot]])
+                else:
+                    self.item_next.append(n + self.terminal_index[production[dot]])
+
+        # FIRST (as a bitmask) and nullability of the symbols from each item's dot onwards
+        self.suffix_first = [None] * len(self.item_prod)
+        for p, start in enumerate(self.prod_start):
+            end = start + len(self.productions[p][1])
+            mask, nullable = 0, True
+            self.suffix_first[end] = (mask, nullable)
+            for item in range(end - 1, start - 1, -1):
+                code = self.item_next[item]
+                if code >= n:
+                    mask, nullable = 1 << (code - n), False
+                elif sets.nullable[code]:
+                    mask |= sets.first[code]
+                else:
+                    mask, nullable = sets.first[code], False
+                self.suffix_first[item] = (mask, nullable)
+
+        # LR(0) closure of each nonterminal's items
+        self.nt_closure = []
+        for a in range(n):
+            seen = {a}
+            queue = [a]
+            items = []
+            while queue:
+                b = queue.pop()
+                for p in self.nt_prods[b]:
+                    item = self.prod_start[p]
+                    items.append(item)
+                    code = self.item_next[item]
+                    if 0 <= code < n and code not in seen:
+                        seen.add(code)
+                        queue.append(code)
+            self.nt_closure.append(tuple(items))
+
+        self.templates = {}
+        self.closures = OrderedDict()
+        self.calls = 0
+        self.hits = 0
+        self.misses = 0
+
+    def is_terminal_code(self, code):
+        return code >= len(self.nonterminals)
+
+    def closure0(self, kernel):
+        self.calls += 1
+        result = set(kernel)
+        n = len(self.nonterminals)
+        for item in kernel:
+            code = self.item_next[item]
+            if 0 <= code < n:
+                result.update(self.nt_closure[code])
+        return sorted(result)
+
+    def template(self, symbol):
+        # Closure of all `symbol` items under a placeholder lookahead, as
+        # (lr0 item, spontaneous lookahead mask, whether the placeholder propagates to it)
+        template = self.templates.get(symbol)
+        if template is not None:
+            return template
+        n = len(self.nonterminals)
+        entries = {}
+        queue = []
+
+        def add(b, spontaneous, propagates):
+            for p in self.nt_prods[b]:
+                item = self.prod_start[p]
+                old = entries.get(item, (0, False))
+                new = (old[0] | spontaneous, old[1] or propagates)
+                if new != old:
+                    entries[item] = new
+                    queue.append(item)
+
+        add(symbol, 0, True)
+        while queue:
+            item = queue.pop()
+            code = self.item_next[item]
+            if 0 <= code < n:
+                mask, nullable = self.suffix_first[item + 1]
+                spontaneous, propagates = entries[item]
+                add(code, mask | spontaneous if nullable else mask, propagates and nullable)
+        template = self.templates[symbol] = [(item, s, p) for item, (s, p) in sorted(entries.items())]
+        return template
+
+    def lookaheads_after(self, lr0, lookahead_mask):
+        # Lookaheads handed to the nonterminal after the dot of `lr0`
+        mask, nullable = self.suffix_first[lr0 + 1]
+        return mask | lookahead_mask if nullable else mask
+
+    def kernel_masks(self, kernel):
+        # LR(1) kernel ints grouped as sorted (lr0 item, lookahead mask) pairs
+        width = self.n_terminals
+        masks = {}
+        for item in kernel:
+            lr0, lookahead = divmod(item, width)
+            masks[lr0] = masks.get(lr0, 0) | 1 << lookahead
+        return sorted(masks.items())
+
+    def closure1_masks(self, kernel):
+        # LR(1) closure as sorted (lr0 item, lookahead mask) pairs; cheaper than expanding every
+        # lookahead into its own item when states carry many lookaheads
+        self.calls += 1
+        closure = self.closures.get(kernel)
+        if closure is not None:
+            self.closures.move_to_end(kernel)
+            self.hits += 1
+            return closure
+        self.misses += 1
+        closure = self.close_masks(self.kernel_masks(kernel))
+        self.closures[kernel] = closure
+        if len(self.closures) > self.closure_cache_size:
+            self.closures.popitem(last=False)
+        return closure
+
+    def close_masks(self, pairs):
+        # Uncached LR(1) closure of (lr0 item, lookahead mask) pairs
+        n = len(self.nonterminals)
+        masks = dict(pairs)
+        needed = {}
+        for lr0, mask in masks.items():
+            code = self.item_next[lr0]
+            if 0 <= code < n:
+                needed[code] = needed.get(code, 0) | self.lookaheads_after(lr0, mask)
+        for symbol, mask in needed.items():
+            for lr0, spontaneous, propagates in self.template(symbol):
+                masks[lr0] = masks.get(lr0, 0) | (spontaneous | mask if propagates else spontaneous)
+        return sorted(masks.items())
+
+    def goto_masks(self, pairs):
+        # Successors of a state given as (lr0 item, lookahead mask) pairs, as code -> sorted pairs
+        self.calls += 1
+        item_next = self.item_next
+        groups = {}
+        for lr0, mask in self.close_masks(pairs):
+            code = item_next[lr0]
+            if code != END:
+                groups.setdefault(code, []).append((lr0 + 1, mask))
+        return groups
+
+    def closure1(self, kernel):
+        width = self.n_terminals
+        return [lr0 * width + t for lr0, mask in self.closure1_masks(kernel) for t in bits(mask)]
+
+    def goto0(self, kernel):
+        # Successor kernels by symbol code; closures are sorted, so every group is a sorted kernel
+        item_next = self.item_next
+        groups = {}
+        for item in self.closure0(kernel):
+            code = item_next[item]
+            if code != END:
+                group = groups.get(code)
+                if group is None:
+                    groups[code] = [item + 1]
+                else:
+                    group.append(item + 1)
+        return {code: tuple(group) for code, group in groups.items()}
+
+    def goto1(self, kernel):
+        item_next = self.item_next
+        width = self.n_terminals
+        groups = {}
+        for lr0, mask in self.closure1_masks(kernel):
+            code = item_next[lr0]
+            if code != END:
+                group = groups.get(code)
+                if group is None:
+                    groups[code] = [(lr0 + 1, mask)]
+                else:
+                    group.append((lr0 + 1, mask))
+        return {code: tuple(lr0 * width + t for lr0, mask in group for t in bits(mask)) for code, group in groups.items()}
+
+    def decode(self, item, width=1):
+        # Back to the (left, production, dot[, lookahead]) tuples used for display
+        lr0, lookahead = divmod(item, width)
+        left, production = self.productions[self.item_prod[lr0]]
+        if width == 1:
+            return (left, production, self.item_dot[lr0])
+        return (left, production, self.item_dot[lr0], self.terminals[lookahead])
+
+
+class StateView:
+    # Read-only sequence of states rendered as sets of item tuples; closures are regenerated
+    # from the stored kernels on access
+    def __init__(self, parser):
+        self.parser = parser
+
+    def __len__(self):
+        return len(self.parser.kernels)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        parser = self.parser
+        width = parser.item_width
+        return {parser.items.decode(item, width) for item in parser.state_items(i)}
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
@@ -0,0 +1,78 @@
+import re
+
+SKIP = None
+
+
+class Lexer:
+    def __init__(self, rules, skip=r'\s+'):
+        # rules: (terminal, regex) pairs, or a dict of them, tried in order at each position.
+        # All rules are compiled into one master regex, so every token costs a single match call.
+        if isinstance(rules, dict):
+            rules = list(rules.items())
+        self.rules = list(rules)
+        if skip is not None:
+            self.rules.append((SKIP, skip))
+        self.terminals = [terminal for terminal, _ in self.rules]
+        self.patterns = {}
+
+    @classmethod
+    def from_terminals(cls, terminals, skip=r'\s+'):
+        # Every terminal matches literally; longer terminals are tried first so that
+        # e.g. `==` wins over `=`
+        literals = sorted((t for t in terminals if t not in ('$', 'ε')), key=len, reverse=True)
+        return cls([(t, re.escape(t)) for t in literals], skip)
+
+    def pattern(self, data):
+        kind = str if isinstance(data, str) else bytes
+        compiled = self.patterns.get(kind)
+        if compiled is None:
+            groups = []
+            for i, (_, regex) in enumerate(self.rules):
+                if kind is bytes and isinstance(regex, str):
+                    regex = regex.encode('utf-8')
+                elif kind is str and isinstance(regex, bytes):
+                    regex = regex.decode('utf-8')
+                groups.append((f'(?P<r{i}>' if kind is str else b'(?P<r%d>' % i) + regex + (')' if kind is str else b')'))
+            compiled = re.compile(('|' if kind is str else b'|').join(groups))
+            # lastindex of a match is the outer group of the rule that matched
+            rule_of = [None] * (compiled.groups + 1)
+            for name, index in compiled.groupindex.items():
+                if name.startswith('r') and name[1:].isdigit():
+                    rule_of[index] = int(name[1:])
+            compiled = (compiled, rule_of)
+            self.patterns[kind] = compiled
+        return compiled
+
+    def scan_rules(self, data, pos=0, endpos=None):
+        # Yields (rule index, start, end) without slicing the input; works on str, bytes,
+        # bytearray, memoryview and mmap. Characters no rule matches come out as rule len(rules).
+        compiled, rule_of = self.pattern(data)
+        match = compiled.match
+        unmatched = len(self.rules)
+        skip = unmatched - 1 if self.rules and self.rules[-1][0] is SKIP else -1
+        if endpos is None:
+            endpos = len(data)
+        while pos < endpos:
+            m = match(data, pos, endpos)
+            if m is None or m.end() == pos:
+                yield unmatched, pos, pos + 1
+                pos += 1
+                continue
+            end = m.end()
+            rule = rule_of[m.lastindex]
+            if rule != skip:
+                yield rule, pos, end
+            pos = end
+
+    def scan(self, data, pos=0, endpos=None):
+        # Yields (terminal, start, end); unmatched characters have terminal None
+        names = self.terminals + [None]
+        return ((names[rule], start, end) for rule, start, end in self.scan_rules(data, pos, endpos))
+
+    def tokenize(self, data, table=None):
+        # Lazy stream of terminal names, or of interned terminal ids when a ParseTable is given
+        if table is None:
+            return (terminal for terminal, _, _ in self.scan(data))
+        unknown = len(table.terminals)
+        ids = [table.terminal_index.get(terminal, unknown) for terminal in self.terminals] + [unknown]
+        return (ids[rule] for rule, _, _ in self.scan_rules(data))
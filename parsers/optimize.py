@@ -0,0 +1,167 @@
+from collections import deque
+from .tables import ParseTable, ERROR, shift_code
+from .items import bits
+
+
+def packed_rows(base, check, value, n_states):
+    # Every used slot of a comb-packed table belongs to exactly one row base (rows with the
+    # same entries share it), so one pass over the slots recovers all rows
+    by_base = {}
+    for i, c in enumerate(check):
+        if c >= 0:
+            by_base.setdefault(i - c, {})[c] = value[i]
+    return [dict(by_base.get(base[state], ())) for state in range(n_states)]
+
+
+def table_rows(table):
+    # Full ACTION rows (explicit entries plus the terminals the default reduction stood for)
+    # and GOTO rows of a ParseTable, as dicts of ints
+    action_rows = packed_rows(table.action_base, table.action_check, table.action_value, table.n_states)
+    for state, row in enumerate(action_rows):
+        for t in bits(table.default_mask[state]):
+            row[t] = table.default[state]
+    goto_rows = packed_rows(table.goto_base, table.goto_check, table.goto_value, table.n_states)
+    return action_rows, goto_rows
+
+
+def unit_states(table, action_rows, goto_rows, keep):
+    # States whose only possible move is reducing one unit production (a single-symbol right
+    # side) outside `keep`: entering such a state is the same as entering goto(below, A)
+    units = {}
+    for state, row in enumerate(action_rows):
+        codes = set(row.values())
+        if len(codes) != 1 or goto_rows[state]:
+            continue
+        code = codes.pop()
+        production = -code - 1
+        if code < 0 and production != 0 and table.prod_len[production] == 1 and production not in keep:
+            units[state] = production
+    return units
+
+
+def bypass(state, below, units, goto_rows, prod_lhs):
+    seen = set()
+    while state in units and state not in seen:
+        seen.add(state)
+        target = goto_rows[below].get(prod_lhs[units[state]])
+        if target is None:
+            break
+        state = target
+    return state
+
+
+def minimize(action_rows, goto_rows):
+    # Keep the states reachable from state 0 and merge states with identical behaviour
+    # (Moore-style partition refinement over action and goto rows). States are renumbered in
+    # breadth-first order from state 0, which stays 0.
+    reachable = [0]
+    seen = {0}
+    queue = deque([0])
+    while queue:
+        state = queue.popleft()
+        targets = [code - 1 for _, code in sorted(action_rows[state].items()) if code > 0]
+        targets += [target for _, target in sorted(goto_rows[state].items())]
+        for target in targets:
+            if target not in seen:
+                seen.add(target)
+                reachable.append(target)
+                queue.append(target)
+
+    def signature(state, classes):
+        action = tuple(sorted((t, ('s', classes[code - 1]) if code > 0 else code)
+                              for t, code in action_rows[state].items()))
+        goto = tuple(sorted((n, classes[target]) for n, target in goto_rows[state].items()))
+        return action, goto
+
+    classes = dict.fromkeys(reachable, 0)
+    count = 1
+    while True:
+        ids = {}
+        refined = {state: ids.setdefault((classes[state], signature(state, classes)), len(ids)) for state in reachable}
+        if len(ids) == count:
+            break
+        classes, count = refined, len(ids)
+
+    # Number the classes in BFS order of their first member
+    number = {}
+    representative = []
+    for state in reachable:
+        if classes[state] not in number:
+            number[classes[state]] = len(number)
+            representative.append(state)
+    renumber = {state: number[classes[state]] for state in reachable}
+    new_action = [{t: shift_code(renumber[code - 1]) if code > 0 else code for t, code in action_rows[state].items()}
+                  for state in representative]
+    new_goto = [{n: renumber[target] for n, target in goto_rows[state].items()} for state in representative]
+    return new_action, new_goto
+
+
+def bypass_units(table, action_rows, goto_rows, units):
+    # Redirects shifts and gotos into unit states in place; returns how many were redirected
+    bypassed = 0
+    for state in range(table.n_states):
+        row = action_rows[state]
+        for t, code in row.items():
+            if code > 0 and code - 1 in units:
+                target = bypass(code - 1, state, units, goto_rows, table.prod_lhs)
+                if target != code - 1:
+                    row[t] = shift_code(target)
+                    bypassed += 1
+        row = goto_rows[state]
+        for n, target in row.items():
+            if target in units:
+                new = bypass(target, state, units, goto_rows, table.prod_lhs)
+                if new != target:
+                    row[n] = new
+                    bypassed += 1
+    return bypassed
+
+
+# Default bound on how much larger the unit bypass may make the packed table, as a fraction
+# of the original size
+MAX_GROWTH = 0.25
+
+
+def optimize_table(table, keep=(), max_growth=MAX_GROWTH):
+    # Post-construction pass over a ParseTable:
+    #   - unit reductions of productions not in `keep` (ids of productions whose semantic
+    #     action must run) are bypassed: shifts and gotos into a state that can only reduce
+    #     A -> X go straight to goto(below, A)
+    #   - unreachable states are dropped and equivalent states merged
+    #   - default reductions and shared identical rows come from ParseTable itself
+    # Bypassing makes rows differ that were shared before, so it can make the packed table
+    # larger. The bypassed table is kept if it grows by at most `max_growth` (a fraction of
+    # the original size; None for no limit). Otherwise the merged-only table is kept if it is
+    # no larger than the original, else the original. stats['layout'] says which.
+    # Returns the new table and before/after statistics.
+    keep = set(keep)
+    action_rows, goto_rows = table_rows(table)
+    units = unit_states(table, action_rows, goto_rows, keep)
+    candidates = []
+    if units:
+        bypassed_action, bypassed_goto = table_rows(table)
+        bypassed = bypass_units(table, bypassed_action, bypassed_goto, units)
+        candidates.append(('bypassed', bypassed_action, bypassed_goto, bypassed))
+    candidates.append(('merged', action_rows, goto_rows, 0))
+    layout, optimized, bypassed = 'original', table, 0
+    for name, action, goto, count in candidates:
+        action, goto = minimize(action, goto)
+        candidate = ParseTable(table.terminals, table.nonterminals, table.productions, action, goto)
+        if name == 'merged':
+            limit = table.nbytes
+        else:
+            limit = None if max_growth is None else table.nbytes * (1 + max_growth)
+        if limit is None or candidate.nbytes <= limit:
+            layout, optimized, bypassed = name, candidate, count
+            break
+    stats = {
+        'layout': layout,
+        'states_before': table.n_states,
+        'states_after': optimized.n_states,
+        'bytes_before': table.nbytes,
+        'bytes_after': optimized.nbytes,
+        'unit_productions': len(set(units.values())) if layout == 'bypassed' else 0,
+        'bypassed_transitions': bypassed,
+        'default_reductions': sum(1 for code in optimized.default if code != ERROR),
+    }
+    return optimized, stats
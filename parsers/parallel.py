@@ -0,0 +1,41 @@
+from concurrent.futures import ProcessPoolExecutor
+from .first_follow import GrammarSets
+from .items import ItemSpace
+
+# Item space of a pool worker, rebuilt once from the grammar by init_worker. Construction is
+# deterministic, so every worker interns symbols, productions and items exactly as the parent.
+worker_items = None
+
+
+def init_worker(cfg):
+    global worker_items
+    sets = GrammarSets(cfg)
+    sets.build_first()
+    worker_items = ItemSpace(cfg, sets)
+
+
+def goto_batch(method, kernels):
+    goto = getattr(worker_items, method)
+    return [goto(kernel) for kernel in kernels]
+
+
+class GotoPool:
+    # Computes the successor kernels of a run of states in a process pool. Results come back
+    # in state order, so the caller can number new states exactly as the serial loop would.
+    def __init__(self, cfg, method, workers, batch_size):
+        self.method = method
+        self.workers = workers
+        self.batch_size = batch_size
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(cfg,))
+
+    def expand(self, kernels):
+        batches = [kernels[i:i + self.batch_size] for i in range(0, len(kernels), self.batch_size)]
+        for results in self.pool.map(goto_batch, [self.method] * len(batches), batches):
+            yield from results
+
+    def span(self):
+        # States handed out per round: one batch for every worker
+        return self.workers * self.batch_size
+
+    def close(self):
+        self.pool.shutdown()
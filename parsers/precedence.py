@@ -0,0 +1,56 @@
+from .symbols import is_terminal
+
+ASSOCIATIVITY = ('left', 'right', 'nonassoc')
+
+
+class Precedence:
+    # yacc-style precedence declarations, lowest first:
+    #   [('left', '+', '-'), ('left', '*', '/'), ('right', '^'), ('nonassoc', '<')]
+    # A production takes the precedence of its rightmost terminal unless `rules` maps it,
+    # as (left, production), to another terminal (yacc's %prec).
+    def __init__(self, declarations, rules=None):
+        self.declarations = [tuple(declaration) for declaration in declarations]
+        self.rules = dict(rules or {})
+        self.levels = {}
+        for level, (associativity, *terminals) in enumerate(self.declarations, 1):
+            if associativity not in ASSOCIATIVITY:
+                raise ValueError(f'Unknown associativity {associativity!r}, expected one of {ASSOCIATIVITY}')
+            for terminal in terminals:
+                if terminal in self.levels:
+                    raise ValueError(f'Precedence of {terminal!r} declared twice')
+                self.levels[terminal] = (level, associativity)
+        for (left, production), terminal in self.rules.items():
+            if terminal not in self.levels:
+                raise ValueError(f'%prec {terminal!r} for {left} -> {" ".join(production)} has no declared precedence')
+
+    @classmethod
+    def of(cls, precedence):
+        # Accept a Precedence, a list of declarations or None
+        if precedence is None or isinstance(precedence, cls):
+            return precedence
+        return cls(precedence)
+
+    def production_level(self, production):
+        terminal = self.rules.get(production)
+        if terminal is None:
+            terminal = next((sym for sym in reversed(production[1]) if is_terminal(sym)), None)
+        return self.levels.get(terminal)
+
+    def resolve(self, production, terminal):
+        # 'shift', 'reduce' or 'error' for a shift/reduce conflict between reducing
+        # `production` and shifting `terminal`; None when either side has no precedence
+        rule = self.production_level(production)
+        token = self.levels.get(terminal)
+        if rule is None or token is None:
+            return None
+        if token[0] > rule[0]:
+            return 'shift'
+        if token[0] < rule[0]:
+            return 'reduce'
+        return {'left': 'reduce', 'right': 'shift', 'nonassoc': 'error'}[token[1]]
+
+    def as_json(self):
+        return [
+            [list(declaration) for declaration in self.declarations],
+            sorted([left, list(production), terminal] for (left, production), terminal in self.rules.items()),
+        ]
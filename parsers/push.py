@@ -0,0 +1,96 @@
+import logging
+
+# Events produced by PushParser.feed / finish:
+#   ('shift', token, state)
+#   ('reduce', left, production)
+#   ('accept',)
+#   ('error', state, token)
+
+
+class PushParser:
+    def __init__(self, parser, events=True):
+        self.table = parser.table
+        self.events = events
+        self.reset()
+
+    def reset(self):
+        self.stack = [0]
+        self.position = 0
+        self.accepted = False
+        self.error = None
+
+    @property
+    def done(self):
+        return self.accepted or self.error is not None
+
+    def feed(self, token):
+        if self.done:
+            raise ValueError('Parser already finished')
+        unknown = len(self.table.terminals)
+        return self.feed_id(self.table.terminal_index.get(token, unknown), token)
+
+    def feed_many(self, tokens):
+        # Lazily yields the events of every token, so a generator or socket reader can drive it
+        for token in tokens:
+            yield from self.feed(token)
+            if self.done:
+                return
+
+    def finish(self):
+        events = self.feed('$')
+        if not self.accepted and self.error is None:
+            self.error = (self.position, self.stack[-1], '$')
+            events.append(('error', self.stack[-1], '$'))
+        return events
+
+    def feed_id(self, symbol, token):
+        table = self.table
+        base, check, value, default = table.action_base, table.action_check, table.action_value, table.default
+        goto_base, goto_check, goto_value = table.goto_base, table.goto_check, table.goto_value
+        stack = self.stack
+        events = []
+        record = self.events
+        while True:
+            state = stack[-1]
+            i = base[state] + symbol
+            code = value[i] if check[i] == symbol else default[state]
+            if code > 0:
+                stack.append(code - 1)
+                self.position += 1
+                if record:
+                    events.append(('shift', token, code - 1))
+                return events
+            elif code < 0:
+                production = -code - 1
+                if production == 0:
+                    self.accepted = True
+                    if record:
+                        events.append(('accept',))
+                    return events
+                n = table.prod_len[production]
+                if n:
+                    del stack[-n:]
+                left = table.prod_lhs[production]
+                i = goto_base[stack[-1]] + left
+                if goto_check[i] != left:
+                    return self.fail(events, stack[-1], token)
+                stack.append(goto_value[i])
+                if record:
+                    events.append(('reduce',) + table.productions[production])
+            else:
+                return self.fail(events, state, token)
+
+    def fail(self, events, state, token):
+        logging.error(f'Error: No action for state {state}, symbol {token}')
+        self.error = (self.position, state, token)
+        events.append(('error', state, token))
+        return events
+
+    # The whole parse state is the stack plus a few scalars, so a snapshot is cheap and
+    # independent of how much input has been consumed
+    def snapshot(self):
+        return (tuple(self.stack), self.position, self.accepted, self.error)
+
+    def restore(self, snapshot):
+        stack, self.position, self.accepted, self.error = snapshot
+        self.stack = list(stack)
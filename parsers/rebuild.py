@@ -0,0 +1,337 @@
+from .symbols import is_non_terminal
+from .first_follow import GrammarSets
+from .tables import shift_code, reduce_code
+from .optimize import table_rows
+
+
+def edit_cfg(cfg, add=(), remove=()):
+    # The grammar after removing and then adding (left, production) pairs, as a new dict, and
+    # the nonterminals whose productions changed. Added productions go after the existing ones
+    # of their nonterminal and new nonterminals after the others, as if appended to the text.
+    cfg = {left: list(productions) for left, productions in cfg.items()}
+    edited = set()
+    for left, production in remove:
+        production = tuple(production)
+        if left == "S'":
+            raise ValueError("The augmented start production S' cannot be edited")
+        if production not in cfg.get(left, ()):
+            raise ValueError(f'No production {left} -> {" ".join(production)} to remove')
+        cfg[left].remove(production)
+        edited.add(left)
+    for left, production in add:
+        production = tuple(production)
+        if left == "S'":
+            raise ValueError("The augmented start production S' cannot be edited")
+        if not is_non_terminal(left):
+            raise ValueError(f'{left!r} is not a nonterminal')
+        if production in cfg.get(left, ()):
+            raise ValueError(f'Production {left} -> {" ".join(production)} already exists')
+        cfg.setdefault(left, []).append(production)
+        edited.add(left)
+    emptied = {left for left in edited if not cfg[left]}
+    for left in emptied:
+        del cfg[left]
+    if emptied:
+        for productions in cfg.values():
+            for production in productions:
+                for symbol in production:
+                    if symbol in emptied:
+                        raise ValueError(f'{symbol} has no productions left but is still used')
+    return cfg, edited
+
+
+def cfg_diff(old, new):
+    # (add, remove) lists that turn grammar `old` into `new`, up to the order of productions
+    add, remove = [], []
+    for left in dict.fromkeys([*old, *new]):
+        before, after = old.get(left, []), new.get(left, [])
+        kept, wanted = set(before), set(after)
+        remove += [(left, production) for production in before if production not in wanted]
+        add += [(left, production) for production in after if production not in kept]
+    return add, remove
+
+
+class GrammarEdit:
+    # Updates a built parser for an edited grammar phase by phase, as a fresh build would, but:
+    #   - FIRST/FOLLOW are recomputed only for the nonterminals that can depend on the edit
+    #     (GrammarSets.update_first/update_follow), unless symbols were renumbered;
+    #   - only states whose closure reaches an edited nonterminal are expanded again. For LR(1)
+    #     closures, nonterminals whose FIRST set or nullability changed count as edited too.
+    #     The other states keep their transitions, so their successors are reused as they are;
+    #   - ACTION/GOTO entries are recomputed only for states that were expanded, are new, or
+    #     whose reductions may have changed. The rows of the others are copied from the old
+    #     table with state and production numbers translated.
+    # Surviving states keep their relative order and new ones follow them, so state ids stay
+    # the same unless states become unreachable. The old attributes are never modified in
+    # place, which is what makes restore() possible.
+    def __init__(self, parser, add, remove):
+        self.parser = parser
+        self.old = dict(parser.__dict__)
+        self.cfg, self.edited = edit_cfg(parser.cfg, add, remove)
+        self.first_changed = set()
+        self.follow_changed = set()
+        self.state_map = None  # old state id -> new one, for states carried over
+        self.expanded = set()  # new ids of states that were expanded again
+        self.clean = {}
+        self.dirty = []
+        self.lr0_map = None
+        self.terminal_map = None
+
+    def restore(self):
+        self.parser.__dict__.clear()
+        self.parser.__dict__.update(self.old)
+
+    def run(self):
+        parser = self.parser
+        parser.cfg = self.cfg
+        parser.conflicts = []
+        parser.run_phase('first', self.update_first)
+        parser.run_phase('follow', self.update_follow)
+        parser.run_phase('states', lambda: parser.rebuild_states(self))
+        parser.run_phase('tables', self.update_tables, parser.check_conflicts, self.update_table)
+        parser.stats['rebuild'] = {
+            'edited': sorted(self.edited),
+            'states': len(parser.kernels),
+            'expanded_states': len(self.expanded) if self.state_map is not None else len(parser.kernels),
+            'rebuilt_rows': len(self.dirty),
+        }
+
+    def update_first(self):
+        parser = self.parser
+        old = self.old['sets']
+        sets = parser.sets = GrammarSets(parser.cfg)
+        if sets.can_update(old):
+            sets.update_first(old, self.edited)
+        else:
+            sets.build_first()
+        parser.first = sets.first_dict()
+        old_first = self.old['first']
+        self.first_changed = {symbol for symbol, first in parser.first.items() if old_first.get(symbol) != first}
+
+    def update_follow(self):
+        parser = self.parser
+        sets, old = parser.sets, self.old['sets']
+        if sets.can_update(old):
+            changed = {sets.nonterminal_index[symbol] for symbol in self.first_changed}
+            sets.update_follow(old, self.edited, changed)
+        else:
+            sets.build_follow()
+        parser.follow = sets.follow_dict()
+        old_follow = self.old['follow']
+        self.follow_changed = {symbol for symbol, follow in parser.follow.items() if old_follow.get(symbol) != follow}
+
+    def translation(self):
+        # Old LR(0) item -> new one and old terminal -> new one, None where they are gone
+        if self.lr0_map is None:
+            old, new = self.old['items'], self.parser.items
+            production_index = {production: p for p, production in enumerate(new.productions)}
+            self.lr0_map = []
+            for p, production in enumerate(old.productions):
+                q = production_index.get(production)
+                for dot in range(len(production[1]) + 1):
+                    self.lr0_map.append(None if q is None else new.prod_start[q] + dot)
+            self.terminal_map = [new.terminal_index.get(t) for t in old.terminals]
+        return self.lr0_map, self.terminal_map
+
+    def reencode(self, kernel, lr1):
+        # An old kernel in the new item space, or None if one of its items no longer exists
+        lr0_map, terminal_map = self.translation()
+        if not lr1:
+            items = [lr0_map[item] for item in kernel]
+            return None if None in items else tuple(sorted(items))
+        old_width, new_width = self.old['items'].n_terminals, self.parser.items.n_terminals
+        items = []
+        for item in kernel:
+            lr0, t = divmod(item, old_width)
+            lr0, t = lr0_map[lr0], terminal_map[t]
+            if lr0 is None or t is None:
+                return None
+            items.append(lr0 * new_width + t)
+        return tuple(sorted(items))
+
+    def touched_items(self, lr1):
+        # Old LR(0) items whose contribution to a closure may differ after the edit: the
+        # nonterminal after the dot was edited or, for LR(1), FIRST of what follows it (up to the
+        # first symbol that is not nullable) involves a nonterminal whose FIRST set changed
+        old = self.old['items']
+        nullable = self.old['sets'].nullable
+        index = old.nonterminal_index
+        n = len(old.nonterminals)
+        edited = {index[name] for name in self.edited if name in index}
+        changed = {index[name] for name in self.first_changed if name in index}
+        item_next = old.item_next
+        touched = [False] * len(item_next)
+        for item, code in enumerate(item_next):
+            if not 0 <= code < n:
+                continue
+            if code in edited:
+                touched[item] = True
+            elif lr1:
+                after = item + 1
+                while 0 <= item_next[after] < n:
+                    if item_next[after] in changed:
+                        touched[item] = True
+                        break
+                    if not nullable[item_next[after]]:
+                        break
+                    after += 1
+        return touched
+
+    def touches(self, lr1):
+        # Predicate on old kernels (items `width` wide): does the closure reach a touched item?
+        old = self.old['items']
+        n = len(old.nonterminals)
+        item_next = old.item_next
+        touched = self.touched_items(lr1)
+        reaches = [any(touched[item] for item in closure) for closure in old.nt_closure]
+
+        def check(kernel, width):
+            for item in kernel:
+                lr0 = item // width
+                code = item_next[lr0]
+                if touched[lr0] or 0 <= code < n and reaches[code]:
+                    return True
+            return False
+        return check
+
+    def update_automaton(self, kernels, transitions, method):
+        # The new (kernels, state_index, transitions) from the old ones, which are numbered in
+        # the old item space; `method` is the ItemSpace goto the automaton was built with
+        parser = self.parser
+        old, new = self.old['items'], parser.items
+        lr1 = method == 'goto1'
+        width = old.n_terminals if lr1 else 1
+        touches = self.touches(lr1)
+
+        encoded = []
+        expand = []
+        for kernel in kernels:
+            encoded.append(self.reencode(kernel, lr1))
+            expand.append(touches(kernel, width))
+        successors = [[] for _ in kernels]
+        for (i, symbol), j in transitions.items():
+            successors[i].append((symbol, j))
+        # States whose old items are gone can only be reached from states expanded again, but a
+        # state leading to one is expanded regardless
+        for i, pairs in enumerate(successors):
+            if not expand[i] and any(encoded[j] is None for _, j in pairs):
+                expand[i] = True
+
+        emit = parser.profiler.emit if parser.profiler is not None and parser.profiler.callback is not None else None
+        index = {kernel: i for i, kernel in enumerate(encoded) if kernel is not None}
+        goto = getattr(new, method)
+        symbols = new.symbols
+        reached = [False] * len(encoded)
+        reached[0] = True
+        queue = [0]
+        expanded = {}
+        for i in queue:
+            if expand[i]:
+                pairs = []
+                groups = goto(encoded[i])
+                for code in sorted(groups):
+                    kernel = groups[code]
+                    j = index.get(kernel)
+                    if j is None:
+                        j = index[kernel] = len(encoded)
+                        encoded.append(kernel)
+                        expand.append(True)
+                        reached.append(False)
+                        if emit is not None:
+                            emit('state', j, kernel)
+                    pairs.append((symbols[code], j))
+                expanded[i] = pairs
+            else:
+                pairs = successors[i]
+            for _, j in pairs:
+                if not reached[j]:
+                    reached[j] = True
+                    queue.append(j)
+
+        order = [i for i in range(len(encoded)) if reached[i]]
+        number = {i: k for k, i in enumerate(order)}
+        new_kernels = [encoded[i] for i in order]
+        state_index = {kernel: k for k, kernel in enumerate(new_kernels)}
+        new_transitions = {}
+        for i in order:
+            for symbol, j in expanded[i] if i in expanded else successors[i]:
+                new_transitions[(number[i], symbol)] = number[j]
+        self.state_map = {i: number[i] for i in range(len(kernels)) if reached[i]}
+        self.expanded = {number[i] for i in order if expand[i]}
+        return new_kernels, state_index, new_transitions
+
+    def clean_states(self):
+        # New id -> old id of the states whose rows can be copied from the old table: not
+        # expanded, same kernel (lookaheads included) and no reduction by a nonterminal whose
+        # FOLLOW set changed. LALR kernels carry lookaheads but its automaton is updated as
+        # LR(0), so the lookaheads of closure items, which depend on FIRST sets, are not
+        # covered by the expansion: states whose closure reaches an item whose FIRST suffix
+        # changed are rebuilt too.
+        if self.state_map is None:
+            return {}
+        parser = self.parser
+        items = parser.items
+        lr1 = parser.goto_method == 'goto1'
+        old_kernels = self.old['kernels']
+        width = self.old['items'].n_terminals
+        touches = self.touches(True) if lr1 and self.first_changed else None
+        clean = {}
+        for o, i in self.state_map.items():
+            if i in self.expanded or parser.kernels[i] != self.reencode(old_kernels[o], lr1):
+                continue
+            if touches is not None and touches(old_kernels[o], width):
+                continue
+            if self.follow_changed:
+                completed = parser.completed_items(i)
+                lefts = {items.productions[items.item_prod[entry[0] if lr1 else entry]][0] for entry in completed}
+                if lefts & self.follow_changed:
+                    continue
+            clean[i] = o
+        return clean
+
+    def update_tables(self):
+        parser = self.parser
+        self.clean = self.clean_states()
+        self.dirty = [i for i in range(len(parser.kernels)) if i not in self.clean]
+        parser.action = {}
+        parser.goto = {}
+        parser.build_action_goto(self.dirty)
+        # Conflicts of copied rows are carried over instead of being found again
+        state_map = self.state_map or {}
+        for conflict in self.old['conflicts']:
+            if state_map.get(conflict['state']) in self.clean:
+                parser.conflicts.append(dict(
+                    conflict,
+                    state=state_map[conflict['state']],
+                    actions=[self.translate_action(action) for action in conflict['actions']],
+                    chosen=self.translate_action(conflict['chosen']),
+                ))
+        parser.conflicts.sort(key=lambda conflict: conflict['state'])
+
+    def translate_action(self, action):
+        return ('s', self.state_map[action[1]]) if action[0] == 's' else action
+
+    def update_table(self):
+        # Copied rows are decoded from the old table, renumbered for the new one and, when the
+        # columns stay the same, left where they were in the packed arrays
+        parser = self.parser
+        table = self.old['table']
+        action_rows, goto_rows = table_rows(table)
+        state_map = self.state_map
+        production_index = {production: p for p, production in enumerate(parser.items.productions)}
+
+        def renumber(code):
+            if code > 0:
+                return shift_code(state_map[code - 1])
+            if code < 0:
+                return reduce_code(production_index[table.productions[-code - 1]])
+            return code
+
+        rows = {}
+        places = {}
+        for i, o in self.clean.items():
+            action = {table.terminals[t]: renumber(code) for t, code in action_rows[o].items()}
+            goto = {table.nonterminals[symbol]: state_map[target] for symbol, target in goto_rows[o].items()}
+            rows[i] = (action, goto)
+            places[i] = (table.action_base[o], table.goto_base[o], renumber(table.default[o]))
+        parser.build_table(rows, (table.terminals, table.nonterminals, places))
@@ -0,0 +1,289 @@
+import json
+import struct
+import sys
+from array import array
+from collections import Counter
+
+# Encoding of ACTION entries:
+#   0      error
+#   v > 0  shift to state v - 1
+#   v < 0  reduce by production -v - 1; production 0 is S' -> S, so reducing it means accept
+ERROR = 0
+
+# Binary table format: magic, format version, metadata length, JSON metadata padded to a
+# multiple of 4 bytes, then the int32 arrays back to back in ARRAYS order
+MAGIC = b'LRTB'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sII')
+ARRAYS = ('action_base', 'action_check', 'action_value', 'default',
+          'goto_base', 'goto_check', 'goto_value', 'prod_lhs', 'prod_len')
+
+
+def shift_code(state):
+    return state + 1
+
+
+def reduce_code(production):
+    return -production - 1
+
+
+def pack_rows(rows, width, fixed=None):
+    # Comb (displacement) packing as in yacc/bison: every non-empty row gets a distinct base
+    # so that `check[base[r] + c] == c` holds exactly for the columns present in row r.
+    # Identical rows share one base. Rows in `fixed` (row -> base) are placed first, at the
+    # given bases, which must come from a valid packing of the same columns.
+    fixed = fixed or {}
+    base = array('i', [0] * len(rows))
+    check = array('i')
+    value = array('i')
+    used = set()
+    shared = {}
+    occupied = 0  # bitmask of taken slots
+    empty = []
+    order = [r for r in fixed if rows[r]]
+    order += sorted((r for r in range(len(rows)) if r not in fixed or not rows[r]), key=lambda r: -len(rows[r]))
+    for r in order:
+        row = rows[r]
+        if not row:
+            empty.append(r)
+            continue
+        key = tuple(sorted(row.items()))
+        if key in shared:
+            base[r] = shared[key]
+            continue
+        cols = [c for c, _ in key]
+        mask = 0
+        for c in cols:
+            mask |= 1 << c
+        if r in fixed:
+            b = fixed[r]
+        else:
+            first_free = (~occupied & (occupied + 1)).bit_length() - 1
+            b = max(0, first_free - cols[0])
+            while b in used or (occupied >> b) & mask:
+                b += 1
+        occupied |= mask << b
+        end = b + cols[-1] + 1
+        if end > len(check):
+            check.extend([-1] * (end - len(check)))
+            value.extend([ERROR] * (end - len(value)))
+        for c, v in key:
+            check[b + c] = c
+            value[b + c] = v
+        used.add(b)
+        shared[key] = b
+        base[r] = b
+    # Pad so that any lookup, including the out-of-range symbol `width`, stays inside the arrays
+    tail = len(check)
+    for r in empty:
+        base[r] = tail
+    check.extend([-1] * (width + 1))
+    value.extend([ERROR] * (width + 1))
+    return base, check, value
+
+
+class ParseTable:
+    # `layout` maps states to (action base, goto base, default code) from an earlier table with
+    # the same terminal columns and a prefix of these nonterminal columns. Those rows keep their
+    # places instead of being packed again; their entries must be the earlier ones renumbered.
+    # `alternatives` maps (state, terminal id) to every action code of a cell whose conflict was
+    # left to the default resolution; only GLRParser looks at it.
+    def __init__(self, terminals, nonterminals, productions, action_rows, goto_rows, layout=None, alternatives=None):
+        layout = layout or {}
+        self.alternatives = alternatives or {}
+        self.terminals = terminals
+        self.nonterminals = nonterminals
+        self.productions = productions
+        self.terminal_index = {t: i for i, t in enumerate(terminals)}
+        self.nonterminal_index = {n: i for i, n in enumerate(nonterminals)}
+        self.prod_lhs = array('i', [self.nonterminal_index[left] for left, _ in productions])
+        self.prod_len = array('i', [len(production) for _, production in productions])
+        self.n_states = len(action_rows)
+
+        # Default reductions: the most common reduce of each row answers for every terminal
+        # without an explicit entry. The terminals it originally covered are kept as a bitmask
+        # so the dict view can still be decoded exactly.
+        self.default = array('i', [ERROR] * self.n_states)
+        self.default_mask = [0] * self.n_states
+        rows = []
+        for s, row in enumerate(action_rows):
+            if s in layout:
+                code = layout[s][2]
+            else:
+                reduces = Counter(v for v in row.values() if v < 0 and v != reduce_code(0))
+                code = reduces.most_common(1)[0][0] if reduces else ERROR
+            if code != ERROR:
+                self.default[s] = code
+                mask = 0
+                for t, v in row.items():
+                    if v == code:
+                        mask |= 1 << t
+                self.default_mask[s] = mask
+                row = {t: v for t, v in row.items() if v != code}
+            rows.append(row)
+        self.action_base, self.action_check, self.action_value = pack_rows(
+            rows, len(terminals), {s: bases[0] for s, bases in layout.items()})
+        self.goto_base, self.goto_check, self.goto_value = pack_rows(
+            goto_rows, len(nonterminals), {s: bases[1] for s, bases in layout.items()})
+
+    @classmethod
+    def from_parser(cls, parser, rows=None, layout=None):
+        # `rows` maps states to ready (action, goto) rows keyed by symbol name, with codes and
+        # targets already numbered for this table; they replace the parser's dict entries.
+        # `layout` is (terminals, nonterminals, {state: places}) of the earlier table and is only
+        # used if the columns turn out to be the same.
+        rows = rows or {}
+        productions = [("S'", parser.cfg["S'"][0])]
+        productions += [(left, production) for left in parser.cfg for production in parser.cfg[left]
+                        if (left, production) != productions[0]]
+        production_index = {p: i for i, p in enumerate(productions)}
+        action, goto = parser.action, parser.goto
+        terminals = ['$'] + sorted(({symbol for _, symbol in action} | {t for row, _ in rows.values() for t in row}) - {'$'})
+        nonterminals = list(dict.fromkeys(["S'"] + [left for left, _ in productions]))
+        terminal_index = {t: i for i, t in enumerate(terminals)}
+        nonterminal_index = {n: i for i, n in enumerate(nonterminals)}
+
+        def encode(op, val):
+            if op == 's':
+                return shift_code(val)
+            if op == 'r':
+                return reduce_code(production_index[val])
+            if op == 'e':
+                # Explicit error (a nonassoc operator): stored as an entry so that the row's
+                # default reduction does not answer for it
+                return ERROR
+            return reduce_code(0)
+
+        action_rows = [{} for _ in range(len(parser.states))]
+        for (state, symbol), (op, val) in action.items():
+            action_rows[state][terminal_index[symbol]] = encode(op, val)
+        goto_rows = [{} for _ in range(len(parser.states))]
+        for (state, symbol), target in goto.items():
+            goto_rows[state][nonterminal_index[symbol]] = target
+        for state, (action_row, goto_row) in rows.items():
+            action_rows[state] = {terminal_index[t]: code for t, code in action_row.items()}
+            goto_rows[state] = {nonterminal_index[symbol]: target for symbol, target in goto_row.items()}
+        if layout is not None:
+            old_terminals, old_nonterminals, places = layout
+            same = terminals == old_terminals and nonterminals[:len(old_nonterminals)] == old_nonterminals
+            layout = places if same else None
+        alternatives = {}
+        for conflict in parser.conflicts:
+            if conflict['resolution'] == 'default':
+                codes = alternatives.setdefault((conflict['state'], terminal_index[conflict['symbol']]), [])
+                for action in [conflict['chosen']] + conflict['actions']:
+                    code = encode(*action)
+                    if code not in codes:
+                        codes.append(code)
+        alternatives = {cell: tuple(codes) for cell, codes in alternatives.items()}
+        return cls(terminals, nonterminals, productions, action_rows, goto_rows, layout, alternatives)
+
+    def encode(self, tokens):
+        # Unknown terminals map to `len(terminals)`, which never matches an explicit entry
+        unknown = len(self.terminals)
+        get = self.terminal_index.get
+        return (get(token, unknown) for token in tokens)
+
+    def lookup_action(self, state, terminal):
+        i = self.action_base[state] + terminal
+        if self.action_check[i] == terminal:
+            return self.action_value[i]
+        return self.default[state]
+
+    def lookup_goto(self, state, nonterminal):
+        i = self.goto_base[state] + nonterminal
+        if self.goto_check[i] == nonterminal:
+            return self.goto_value[i]
+        return None
+
+    def decode(self, code):
+        if code == ERROR:
+            return ('e', None)
+        if code > 0:
+            return ('s', code - 1)
+        if code == reduce_code(0):
+            return ('acc', None)
+        return ('r', self.productions[-code - 1])
+
+    def action_entry(self, state, terminal):
+        # The code the dict view holds for a cell, or None where it has no entry. Unlike
+        # lookup_action, a default reduction only answers for the terminals it came from.
+        i = self.action_base[state] + terminal
+        if self.action_check[i] == terminal:
+            return self.action_value[i]
+        if self.default_mask[state] >> terminal & 1:
+            return self.default[state]
+        return None
+
+    def action_dict(self):
+        action = {}
+        for state in range(self.n_states):
+            for t, symbol in enumerate(self.terminals):
+                code = self.action_entry(state, t)
+                if code is not None:
+                    action[(state, symbol)] = self.decode(code)
+        return action
+
+    def goto_dict(self):
+        goto = {}
+        for state in range(self.n_states):
+            for n, symbol in enumerate(self.nonterminals):
+                target = self.lookup_goto(state, n)
+                if target is not None:
+                    goto[(state, symbol)] = target
+        return goto
+
+    @property
+    def nbytes(self):
+        return sum(len(getattr(self, name)) * 4 for name in ARRAYS)
+
+    def dumps(self):
+        meta = {
+            'byteorder': sys.byteorder,
+            'terminals': self.terminals,
+            'nonterminals': self.nonterminals,
+            'productions': self.productions,
+            'n_states': self.n_states,
+            'default_mask': self.default_mask,
+            'alternatives': [[state, t, list(codes)] for (state, t), codes in self.alternatives.items()],
+            'lengths': [len(getattr(self, name)) for name in ARRAYS],
+        }
+        meta = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+        meta += b' ' * (-len(meta) % 4)
+        chunks = [HEADER.pack(MAGIC, FORMAT_VERSION, len(meta)), meta]
+        chunks += [array('i', getattr(self, name)).tobytes() for name in ARRAYS]
+        return b''.join(chunks)
+
+    def __reduce__(self):
+        # Arrays loaded from a cache are memoryviews, which do not pickle; the binary format
+        # does, and is what a process pool worker receives
+        return (ParseTable.loads, (self.dumps(),))
+
+    @classmethod
+    def loads(cls, buffer):
+        # `buffer` may be an mmap: the arrays are then zero-copy int views of the mapping
+        view = memoryview(buffer)
+        if len(view) < HEADER.size:
+            raise ValueError('Truncated parse table')
+        magic, version, meta_len = HEADER.unpack_from(view)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f'Unsupported parse table format {magic!r} v{version}')
+        offset = HEADER.size + meta_len
+        meta = json.loads(bytes(view[HEADER.size:offset]).decode('utf-8'))
+        if meta['byteorder'] != sys.byteorder:
+            raise ValueError('Parse table was written on a machine with a different byte order')
+        if offset + 4 * sum(meta['lengths']) != len(view):
+            raise ValueError('Truncated parse table')
+        table = cls.__new__(cls)
+        table.terminals = meta['terminals']
+        table.nonterminals = meta['nonterminals']
+        table.productions = [(left, tuple(production)) for left, production in meta['productions']]
+        table.terminal_index = {t: i for i, t in enumerate(table.terminals)}
+        table.nonterminal_index = {n: i for i, n in enumerate(table.nonterminals)}
+        table.n_states = meta['n_states']
+        table.default_mask = meta['default_mask']
+        table.alternatives = {(state, t): tuple(codes) for state, t, codes in meta.get('alternatives', ())}
+        for name, length in zip(ARRAYS, meta['lengths']):
+            setattr(table, name, view[offset:offset + 4 * length].cast('i'))
+            offset += 4 * length
+        return table
@@ -0,0 +1,80 @@
+from array import array
+
+
+class SyntaxTree:
+    # Concrete syntax tree stored column-wise: node i is described by production[i], first[i],
+    # count[i], start[i] and end[i], with no per-node objects.
+    #   production  production id of an interior node, ~terminal id of a token leaf
+    #   first       offset of the node's children in `children`
+    #   count       number of children
+    #   start, end  span of the node in token positions (end exclusive)
+    # Children of a node are contiguous in `children`, in left-to-right order. Nodes are
+    # numbered in the order the parser completes them, so every child precedes its parent.
+    def __init__(self, table):
+        self.table = table
+        self.production = array('i')
+        self.first = array('i')
+        self.count = array('i')
+        self.start = array('i')
+        self.end = array('i')
+        self.children = array('i')
+        self.root = -1
+
+    def __len__(self):
+        return len(self.production)
+
+    @property
+    def nbytes(self):
+        return sum(len(column) * column.itemsize for column in
+                   (self.production, self.first, self.count, self.start, self.end, self.children))
+
+    def add(self, production, children, start, end):
+        node = len(self.production)
+        self.production.append(production)
+        self.first.append(len(self.children))
+        self.count.append(len(children))
+        self.start.append(start)
+        self.end.append(end)
+        self.children.extend(children)
+        return node
+
+    # Callbacks for SLRParser.parse_values
+    def shift(self, symbol, token, position):
+        return self.add(~symbol, (), position, position + 1)
+
+    def reduce(self, production, children, position):
+        if children:
+            return self.add(production, children, self.start[children[0]], self.end[children[-1]])
+        return self.add(production, children, position, position)
+
+    def is_token(self, node):
+        return self.production[node] < 0
+
+    def symbol(self, node):
+        production = self.production[node]
+        if production < 0:
+            return self.table.terminals[~production]
+        return self.table.productions[production][0]
+
+    def child_nodes(self, node):
+        first = self.first[node]
+        return self.children[first:first + self.count[node]]
+
+    def walk(self, node=None):
+        # Pre-order traversal without recursion
+        stack = [self.root if node is None else node]
+        while stack:
+            node = stack.pop()
+            yield node
+            first = self.first[node]
+            stack.extend(reversed(self.children[first:first + self.count[node]]))
+
+    def tokens(self, node=None):
+        return [n for n in self.walk(node) if self.production[n] < 0]
+
+    def to_tuple(self, node=None):
+        # Nested (symbol, children...) tuples; meant for small trees and debugging
+        node = self.root if node is None else node
+        if self.production[node] < 0:
+            return self.symbol(node)
+        return (self.symbol(node),) + tuple(self.to_tuple(child) for child in self.child_nodes(node))
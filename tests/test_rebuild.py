@@ -0,0 +1,130 @@
+import logging
+import random
+import unittest
+from parsers import SLRParser, CLRParser, LALRParser, PGMParser
+from parsers.rebuild import edit_cfg
+from benchmarks.grammars import corpus
+
+KINDS = (SLRParser, CLRParser, LALRParser, PGMParser)
+
+# An edited parser must end up with the tables a fresh build of the edited grammar gets. State
+# ids may differ (an edit keeps surviving states where they were), so both automata are
+# renumbered breadth-first over their transitions, symbols in sorted order, before comparing.
+
+
+def canonical(parser):
+    successors = {}
+    for (i, symbol), j in parser.transitions.items():
+        successors.setdefault(i, []).append((symbol, j))
+    number = {0: 0}
+    order = [0]
+    for i in order:
+        for _, j in sorted(successors.get(i, ())):
+            if j not in number:
+                number[j] = len(order)
+                order.append(j)
+
+    def action(value):
+        return ('s', number[value[1]]) if value[0] == 's' else value
+
+    actions = {(number[i], t): action(value) for (i, t), value in parser.action.items()}
+    gotos = {(number[i], symbol): number[j] for (i, symbol), j in parser.goto.items()}
+    conflicts = sorted(
+        (number[c['state']], c['symbol'], c['kind'], sorted(map(action, c['actions']), key=repr),
+         action(c['chosen']), c['resolution'])
+        for c in parser.conflicts
+    )
+    return len(parser.kernels), actions, gotos, conflicts
+
+
+def random_cfg(rng):
+    nonterminals = ['S', 'A', 'B', 'C', 'D'][:rng.randint(2, 5)]
+    terminals = ['a', 'b', 'c', 'd'][:rng.randint(2, 4)]
+    cfg = {"S'": [('S',)]}
+    for left in nonterminals:
+        productions = []
+        for _ in range(rng.randint(1, 3)):
+            production = tuple(rng.choice(nonterminals + terminals * 2) for _ in range(rng.randint(0, 3)))
+            if not production and rng.random() < 0.5:
+                production = ('ε',)
+            if production not in productions:
+                productions.append(production)
+        cfg[left] = productions
+    return cfg, nonterminals, terminals
+
+
+class EditMatchesFreshBuild(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def assertSameTables(self, edited, kind, context):
+        fresh = kind(edited.cfg, precedence=edited.precedence, strict=edited.strict)
+        self.assertEqual(edited.first, fresh.first, context)
+        self.assertEqual(edited.follow, fresh.follow, context)
+        self.assertEqual(canonical(edited), canonical(fresh), context)
+
+    def test_lalr_closure_lookaheads_follow_first_sets(self):
+        # A -> ε makes A nullable, so the lookaheads of D -> . in the state after x change even
+        # though no state is expanded again
+        cfg = {
+            "S'": [('S',)],
+            'S': [('x', 'D', 'A'), ('y', 'D'), ('x', 'E', 'e'), ('x', 'E', 'f'), ('x', 'E', 'g')],
+            'D': [(), ('d',)],
+            'E': [(), ('d', 'd', 'd')],
+            'A': [('a',)],
+        }
+        parser = LALRParser(cfg)
+        parser.add_production('A', ())
+        self.assertTrue(parser.parse(['x']))
+        self.assertSameTables(parser, LALRParser, 'A -> ε')
+
+    def test_corpus_remove_and_add_back(self):
+        rng = random.Random(0)
+        for name, (cfg, _) in corpus(quick=True).items():
+            productions = [(left, p) for left, ps in cfg.items() if left != "S'" for p in ps]
+            for kind in KINDS:
+                try:
+                    parser = kind(cfg)
+                except ValueError:
+                    continue
+                for left, production in rng.sample(productions, min(2, len(productions))):
+                    context = f'{name} {kind.__name__} {left} -> {production}'
+                    try:
+                        kind(edit_cfg(parser.cfg, remove=[(left, production)])[0])
+                    except (ValueError, KeyError):
+                        continue
+                    parser.remove_production(left, production)
+                    self.assertSameTables(parser, kind, 'remove ' + context)
+                    parser.add_production(left, production)
+                    self.assertSameTables(parser, kind, 'add ' + context)
+
+    def test_random_grammars_with_empty_productions(self):
+        for seed in range(150):
+            rng = random.Random(seed)
+            cfg, nonterminals, terminals = random_cfg(rng)
+            for kind in KINDS:
+                try:
+                    parser = kind(cfg, strict=False)
+                except (ValueError, KeyError):
+                    continue
+                for step in range(6):
+                    if rng.random() < 0.5:
+                        length = rng.randint(0, 3)
+                        add = [(rng.choice(nonterminals), tuple(rng.choice(nonterminals + terminals) for _ in range(length)))]
+                        remove = []
+                    else:
+                        add = []
+                        remove = [rng.choice([(left, p) for left, ps in parser.cfg.items() if left != "S'" for p in ps])]
+                    try:
+                        kind(edit_cfg(parser.cfg, add, remove)[0], strict=False)
+                    except (ValueError, KeyError):
+                        continue
+                    parser.edit_grammar(add=add, remove=remove)
+                    self.assertSameTables(parser, kind, f'seed {seed} {kind.__name__} step {step}: +{add} -{remove}')
+
+
+if __name__ == '__main__':
+    unittest.main()